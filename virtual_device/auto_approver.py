@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Auto-Approver Stand-in
+แทนขั้นตอน /prop -> devices_pending -> admin approval -> /config ของเว็บ
+เพื่อให้ทดสอบ registration loop ได้ทั้งหมดบนเครื่องเดียว
+
+- /prop ครั้งแรกของอุปกรณ์ = เพิ่มใน pending แล้ว schedule การอนุมัติหลัง approve_delay วินาที
+- /prop ซ้ำระหว่างรอ = อัปเดต pending (นับ resubmission)
+- /prop จากอุปกรณ์ที่อนุมัติแล้ว = ส่ง /config ซ้ำทันที (เหมือน mqtt-service.ts)
+- approvals_per_second จำกัดอัตราการอนุมัติ (จำลอง admin / ingest ที่ช้า)
+- ตอบเฉพาะ device_id ที่ขึ้นต้นด้วย device_prefix ของ benchmark เท่านั้น
+  อุปกรณ์จริงที่รออนุมัติบน broker เดียวกันจะไม่ถูกอนุมัติโดยไม่มี admin
+
+ใช้ได้ทั้งกับ paho Client (เวลาจริง) และ LocalClient (เวลาจำลอง)
+
+Usage:
+    python auto_approver.py --prefix ESP32_REG --delay 2 --rate 50
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+
+import paho.mqtt.client as mqtt
+from dotenv import load_dotenv
+
+from fleet_logging import StructuredLogger
+from sim_clock import RealClock
+
+# Load environment variables
+load_dotenv()
+
+
+def build_config_message(device_id, faculty, sent_at):
+    """/config ในรูปแบบเดียวกับ sendConfigToApprovedDevice() ใน mqtt-service.ts"""
+    return {
+        "device_id": device_id,
+        "device_name": device_id,
+        "faculty": faculty,
+        "location": {"building": "N/A", "floor": "N/A", "room": "N/A"},
+        "power_limit": 3000,
+        "data_interval": 15,
+        "approved": True,
+        "config_sent_at": sent_at,
+    }
+
+
+class TimerThread:
+    """call_later สำหรับเวลาจริง: thread เดียว + heap ของ (เวลา, ลำดับ, callback) เหมือน EventScheduler
+
+    อุปกรณ์ที่รออนุมัติ N ตัวจึงใช้ thread เดียว ไม่ใช่ threading.Timer N ตัว
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or RealClock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = True
+        self.log = StructuredLogger("auto_approver.timer")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def call_later(self, delay, callback, *args):
+        with self._condition:
+            heapq.heappush(self._queue, (self.clock.now() + delay, next(self._sequence), callback, args))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and (not self._queue or self._queue[0][0] > self.clock.now()):
+                    timeout = self._queue[0][0] - self.clock.now() if self._queue else None
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+                _, _, callback, args = heapq.heappop(self._queue)
+            # callback ที่ error ต้องไม่หยุด thread (การอนุมัติที่เหลือทั้งหมดรออยู่ใน heap เดียวกัน)
+            try:
+                callback(*args)
+            except Exception as e:
+                self.log.event("timer_callback_error", level=logging.ERROR,
+                               callback=getattr(callback, "__qualname__", repr(callback)), error=str(e))
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+
+
+class AutoApprover:
+    def __init__(self, client, device_prefix, clock=None, call_later=None,
+                 approve_delay=0.0, approvals_per_second=None, prop_topic="devices/+/+/prop"):
+        if not device_prefix:
+            raise ValueError("device_prefix ต้องไม่ว่าง (ป้องกันการอนุมัติอุปกรณ์จริง)")
+        self.client = client
+        self.device_prefix = device_prefix
+        self.clock = clock or RealClock()
+        # เวลาจำลองส่ง scheduler.call_later มา ส่วนเวลาจริงใช้ TimerThread ของตัวเอง
+        self._timer = None
+        if call_later is None:
+            self._timer = TimerThread(self.clock)
+            call_later = self._timer.call_later
+        self.call_later = call_later
+        self.approve_delay = approve_delay
+        self.approvals_per_second = approvals_per_second
+        self.prop_topic = prop_topic
+
+        self.pending = {}  # device_id -> {"faculty", "first_seen", "updates"}
+        self.approved = set()
+        self.counters = {"props": 0, "ignored": 0, "approved": 0, "config_resent": 0}
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+        self.subscribed = threading.Event()  # set เมื่อ broker ตอบ SUBACK ของ prop_topic
+        self.client.on_connect = self.on_connect
+        self.client.on_subscribe = self.on_subscribe
+        self.client.on_message = self.on_message
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(self.prop_topic, qos=1)
+            print(f"📡 Auto-approver subscribe: {self.prop_topic}")
+        else:
+            print(f"❌ การเชื่อมต่อ MQTT ล้มเหลว: {rc}")
+
+    def on_subscribe(self, client, userdata, mid, granted_qos):
+        self.subscribed.set()
+
+    def on_message(self, client, userdata, msg):
+        try:
+            _, faculty, device_id, _ = msg.topic.split('/')
+        except ValueError:
+            return
+
+        now = self.clock.now()
+        with self._lock:
+            if not device_id.startswith(self.device_prefix):
+                self.counters["ignored"] += 1
+                return
+            self.counters["props"] += 1
+            if device_id in self.approved:
+                # อุปกรณ์อนุมัติแล้ว -> ส่ง config อัตโนมัติ
+                self.counters["config_resent"] += 1
+                resend = True
+            elif device_id in self.pending:
+                self.pending[device_id]["updates"] += 1
+                return
+            else:
+                self.pending[device_id] = {"faculty": faculty, "first_seen": now, "updates": 0}
+                resend = False
+                approve_at = now + self.approve_delay
+                if self.approvals_per_second:
+                    approve_at = max(approve_at, self._next_slot)
+                    self._next_slot = approve_at + 1 / self.approvals_per_second
+
+        if resend:
+            self.send_config(faculty, device_id)
+        else:
+            self.call_later(approve_at - now, self.approve, device_id)
+
+    def approve(self, device_id):
+        """admin อนุมัติ: ย้ายจาก pending ไป approved แล้วส่ง /config"""
+        with self._lock:
+            entry = self.pending.pop(device_id, None)
+            if entry is None:
+                return
+            self.approved.add(device_id)
+            self.counters["approved"] += 1
+        self.send_config(entry["faculty"], device_id)
+
+    def send_config(self, faculty, device_id):
+        config = build_config_message(device_id, faculty, self.clock.isoformat())
+        self.client.publish(f"devices/{faculty}/{device_id}/config", json.dumps(config), qos=1)
+
+    def stop(self):
+        """หยุด TimerThread (การอนุมัติที่ยังไม่ถึงเวลาจะถูกยกเลิก)"""
+        if self._timer:
+            self._timer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auto-approver stand-in for the admin approval flow")
+    parser.add_argument("--prefix", required=True, help="อนุมัติเฉพาะ device_id ที่ขึ้นต้นด้วย prefix นี้")
+    parser.add_argument("--delay", type=float, default=0.0, help="วินาทีจาก /prop แรกจนอนุมัติ")
+    parser.add_argument("--rate", type=float, default=None, help="จำนวนการอนุมัติสูงสุดต่อวินาที")
+    parser.add_argument("--topic", default="devices/+/+/prop")
+    args = parser.parse_args()
+
+    client = mqtt.Client(client_id=f"auto_approver_{os.getpid()}")
+    client.username_pw_set(os.getenv("MQTT_USERNAME", "electric_energy"), os.getenv("MQTT_PASSWORD", "electric_energy"))
+    approver = AutoApprover(client, args.prefix, approve_delay=args.delay, approvals_per_second=args.rate, prop_topic=args.topic)
+
+    broker_host = os.getenv("MQTT_BROKER_HOST", "iot666.ddns.net")
+    broker_port = int(os.getenv("MQTT_BROKER_PORT", "1883"))
+    print(f"🤖 Auto-approver: {broker_host}:{broker_port} ({args.prefix}*, delay {args.delay}s, "
+          f"rate {args.rate or '∞'}/s)")
+    client.connect(broker_host, broker_port, 60)
+
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        print(f"\n🛑 หยุดการทำงาน... {approver.counters}")
+        approver.stop()
+        client.disconnect()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Fleet Memory Benchmark
+วัดหน่วยความจำต่ออุปกรณ์ของ FleetState ที่ขนาด 1k, 10k และ 100k devices
+เทียบกับ VirtualDevice (baseline: หนึ่ง object + paho Client ต่ออุปกรณ์)
+
+- tracemalloc : byte ที่ Python allocate จริง (arrays, timing wheel, สถานะหลังได้รับ /config)
+
+ทุกอุปกรณ์ได้รับ /config จริง (build_config_message ผ่าน JSON เหมือนรับจาก broker)
+- RSS delta   : หน่วยความจำของ process (ที่ขนาดเล็กมักเป็น 0 เพราะ allocator ใช้ arena เดิม)
+
+แต่ละขนาดรันใน subprocess แยก เพื่อไม่ให้หน่วยความจำของรอบก่อนปนกัน
+
+Usage:
+    python benchmark_fleet_memory.py
+    python benchmark_fleet_memory.py 1000 50000 250000
+    python benchmark_fleet_memory.py --baseline-devices 2000
+"""
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from auto_approver import build_config_message
+
+# VirtualDevice ใช้ ~7 KB ต่อตัว จึงวัด baseline ที่ขนาดเดียวเท่านั้น
+BASELINE_DEVICES = 10000
+
+
+def read_rss_bytes():
+    """อ่าน RSS ปัจจุบันของ process (Linux: /proc/self/status)"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # Fallback: peak RSS (kB บน Linux, bytes บน macOS)
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def config_payload(device_id):
+    """/config ที่อุปกรณ์ได้รับหลังอนุมัติ (parse ใหม่ทุกตัวเหมือน on_message)"""
+    return json.loads(json.dumps(build_config_message(device_id, "engineering", "2025-01-01T00:00:00+00:00")))
+
+
+def build_fleet(size):
+    from fleet_state import FleetState
+
+    fleet = FleetState(size, connections=max(1, size // 25000))
+    fleet.schedule_all(time.time())
+    # ทุกอุปกรณ์ลงทะเบียนแล้ว (หลัง registration wave)
+    for index in range(size):
+        fleet.mark_registered(index, config_payload(fleet.device_id(index)))
+    return fleet
+
+
+def build_virtual_devices(size):
+    """VirtualDevice ที่ยังไม่ได้ start (ไม่รวม stack ของ thread 2 ตัวต่ออุปกรณ์)"""
+    from virtual_device_with_config_file import VirtualDevice
+
+    devices = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index in range(size):
+            device = VirtualDevice(device_id=f"ESP32_MEM_{index:06d}", persist_files=False)
+            # สถานะหลัง handle_config_message(): เก็บ config dict ไว้ใน device_config
+            device.device_config = config_payload(device.device_id)
+            device.is_registered = True
+            devices.append(device)
+    return devices
+
+
+def measure(kind, size):
+    """สร้างอุปกรณ์ size ตัวแล้วคืนค่า RSS และ tracemalloc ที่เพิ่มขึ้น"""
+    build = build_fleet if kind == "fleet" else build_virtual_devices
+    # import ก่อนวัด เพื่อไม่ให้ module (paho, dotenv) ถูกนับเป็นต้นทุนของอุปกรณ์
+    import fleet_state  # noqa: F401
+    import virtual_device_with_config_file  # noqa: F401
+
+    # รอบแรก: RSS และเวลาสร้าง (ไม่มี overhead ของ tracemalloc)
+    baseline = read_rss_bytes()
+    started = time.perf_counter()
+    devices = build(size)
+    elapsed = time.perf_counter() - started
+    rss_delta = read_rss_bytes() - baseline
+
+    # รอบสอง: byte ที่ allocate จริง
+    tracemalloc.start()
+    traced_before = tracemalloc.get_traced_memory()[0]
+    traced_devices = build(size)
+    traced = tracemalloc.get_traced_memory()[0] - traced_before
+    tracemalloc.stop()
+    del devices, traced_devices
+
+    return {
+        "kind": kind,
+        "devices": size,
+        "rss_delta_bytes": rss_delta,
+        "rss_bytes_per_device": rss_delta / size,
+        "traced_bytes": traced,
+        "traced_bytes_per_device": traced / size,
+        "build_seconds": round(elapsed, 3),
+    }
+
+
+def run_child(kind, size):
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', kind, str(size)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(sizes, baseline_devices=BASELINE_DEVICES):
+    print("📏 Fleet Memory Benchmark")
+    print(f"{'':>13} | {'devices':>8} | {'traced/device':>13} | {'RSS delta':>12} | {'RSS/device':>10} | "
+          f"{'build (s)':>9}")
+    print("-" * 82)
+
+    rows = []
+    if baseline_devices:
+        rows.append(("VirtualDevice", run_child("virtual", baseline_devices)))
+    rows.extend(("FleetState", run_child("fleet", size)) for size in sizes)
+
+    for label, result in rows:
+        print(f"{label:>13} | {result['devices']:>8} | {result['traced_bytes_per_device']:>11.1f} B "
+              f"| {result['rss_delta_bytes'] / 1024 / 1024:>9.2f} MB | {result['rss_bytes_per_device']:>8.1f} B "
+              f"| {result['build_seconds']:>9.3f}")
+
+    if baseline_devices and sizes:
+        virtual = rows[0][1]["traced_bytes_per_device"]
+        fleet = rows[-1][1]["traced_bytes_per_device"]
+        print(f"\n💾 FleetState ใช้ {fleet:.1f} B/device เทียบกับ VirtualDevice {virtual:.0f} B/device "
+              f"(เล็กกว่า ×{virtual / fleet:.0f}, ยังไม่นับ stack ของ thread ใน VirtualDevice)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        print(json.dumps(measure(sys.argv[2], int(sys.argv[3]))))
+    else:
+        args = sys.argv[1:]
+        baseline_devices = BASELINE_DEVICES
+        if '--baseline-devices' in args:
+            position = args.index('--baseline-devices')
+            baseline_devices = int(args[position + 1])
+            del args[position:position + 2]
+        main([int(arg) for arg in args] or [1000, 10000, 100000], baseline_devices)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Logging Benchmark
+เปรียบเทียบ publish throughput ของ FleetSimulator (dry run) เมื่อ:
+- off        : ไม่บันทึก event ต่อข้อความ (นับอย่างเดียว)
+- sampled    : QueueHandler + JSON lines, sample 1%
+- all        : QueueHandler + JSON lines, ทุกข้อความ
+- print      : print() ทุกข้อความแบบเดิม
+
+Output ของทุกโหมดเขียนลงไฟล์ชั่วคราว เพื่อไม่ให้ความเร็ว terminal ปนในผลวัด
+(โหมด print บน terminal จริงจะช้ากว่าตัวเลขที่วัดได้นี้อีกมาก)
+
+Usage:
+    python benchmark_logging.py [messages]
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+from fleet_state import FleetState, FleetSimulator
+from fleet_logging import configure_logging, shutdown_logging
+
+REPEATS = 3
+
+
+class PrintingFleetSimulator(FleetSimulator):
+    """จำลองพฤติกรรมเดิม: print หนึ่งบรรทัดต่อการ publish (line-buffered เหมือน terminal)"""
+
+    def publish(self, conn, topic, payload):
+        super().publish(conn, topic, payload)
+        print(f"📊 ส่ง /data: {topic} ({time.strftime('%H:%M:%S')})", flush=True)
+
+
+def run_mode(mode, messages, log_file):
+    fleet = FleetState(messages, connections=4)
+    for index in range(fleet.size):
+        fleet.registered[index] = 1
+    fleet.schedule_all(0)
+
+    sample_rate = {"off": 0, "sampled": 0.01, "all": 1.0, "print": 0}[mode]
+    simulator_class = PrintingFleetSimulator if mode == "print" else FleetSimulator
+    simulator = simulator_class(fleet, dry_run=True, sample_rate=sample_rate)
+
+    configure_logging(log_file=log_file)
+    with open(log_file, 'a', encoding='utf-8') as sink, contextlib.redirect_stdout(sink):
+        started = time.perf_counter()
+        simulator.tick(fleet.interval[0] + 1)  # ทุกอุปกรณ์ถึงกำหนดพร้อมกัน
+        elapsed = time.perf_counter() - started
+        shutdown_logging()  # รวมเวลา flush queue ไว้ภายนอก hot path
+    drained = time.perf_counter() - started
+
+    return simulator.counters["published"], elapsed, drained
+
+
+def main(messages):
+    print(f"📝 Logging Benchmark ({messages} publishes ต่อโหมด, dry run)")
+    print(f"{'mode':>8} | {'msg/s':>10} | {'hot path (s)':>12} | {'incl. flush (s)':>15}")
+    print("-" * 56)
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("off", "sampled", "all", "print"):
+            # ใช้ผลที่ดีที่สุดจาก REPEATS รอบ เพื่อลด noise
+            runs = [run_mode(mode, messages, os.path.join(tmp, f"{mode}_{i}.log")) for i in range(REPEATS)]
+            published, elapsed, drained = min(runs, key=lambda run: run[1])
+            rate = published / elapsed
+            baseline = baseline or rate
+            print(f"{mode:>8} | {rate:>10.0f} | {elapsed:>12.3f} | {drained:>15.3f}  ({rate / baseline:.0%} ของ off)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Capacity Finder - หาอัตรา ingest สูงสุดที่ broker / ingest รับได้ภายใต้ SLO
+
+Workflow:
+1. เพิ่มโหลดทีละขั้น (จำนวนอุปกรณ์ หรือ data_interval ที่สั้นลง) ด้วย FleetSimulator
+   (payload เดียวกับ VirtualDevice, QoS1 เป็นค่าเริ่มต้น)
+2. แต่ละขั้นวัด PUBACK latency, in-flight backlog และ delivery loss (subscriber นับ /data ที่ได้รับจริง)
+3. เมื่อขั้นใดผิด SLO ให้ถอยกลับแล้ว binary search หา knee
+4. รายงาน msg/s สูงสุดที่รับได้ และ devices-per-interval พร้อม curve ของทุกขั้น
+
+Usage:
+    python capacity_finder.py --start-devices 500 --slo-p99-ms 200
+    python capacity_finder.py --vary interval --devices 2000 --start-interval 30
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from fleet_state import FleetState, FleetSimulator
+
+
+class DeliveryCounter:
+    """subscriber ที่นับ /data ที่ผ่าน broker มาจริง แยกตาม device prefix ของแต่ละขั้น
+
+    เป็น Python subscriber ตัวเดียว จึงอาจรับไม่ทันก่อน broker จะเต็ม (ดู subscriber_limited)
+    """
+
+    def __init__(self, faculty, broker_host=None, broker_port=None):
+        self.topic = f"devices/{faculty}/+/data"
+        self.counts = {}
+        self.first_at = {}  # prefix -> เวลาที่ได้รับข้อความแรก
+        self.last_at = {}   # prefix -> เวลาที่ได้รับข้อความล่าสุด
+        self._lock = threading.Lock()
+
+        # MQTT Configuration (เหมือน FleetSimulator)
+        self.broker_host = broker_host or os.getenv("MQTT_BROKER_HOST", "iot666.ddns.net")
+        self.broker_port = int(broker_port or os.getenv("MQTT_BROKER_PORT", "1883"))
+        self.client = mqtt.Client(client_id=f"capacity_finder_sub_{os.getpid()}")
+        self.client.username_pw_set(os.getenv("MQTT_USERNAME", "electric_energy"),
+                                    os.getenv("MQTT_PASSWORD", "electric_energy"))
+        self.client.on_connect = lambda client, userdata, flags, rc: client.subscribe(self.topic, qos=1)
+        self.client.on_message = self.on_message
+
+    def on_message(self, client, userdata, msg):
+        prefix = msg.topic.split('/')[2].rpartition('_')[0]
+        now = time.time()
+        with self._lock:
+            self.counts[prefix] = self.counts.get(prefix, 0) + 1
+            self.first_at.setdefault(prefix, now)
+            self.last_at[prefix] = now
+
+    def received(self, prefix):
+        with self._lock:
+            return self.counts.get(prefix, 0)
+
+    def receive_rate(self, prefix, duration):
+        """อัตราที่ subscriber รับได้จริง (ถ้ารับไม่ทัน ข้อความจะยังทยอยมาหลังจบขั้น)"""
+        with self._lock:
+            count = self.counts.get(prefix, 0)
+            if not count:
+                return 0.0
+            span = self.last_at[prefix] - self.first_at[prefix]
+        return count / max(duration, span)
+
+    def start(self):
+        self.client.connect(self.broker_host, self.broker_port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+class CapacityFinder:
+    def __init__(self, args):
+        self.args = args
+        self.points = []  # curve ของทุกขั้น (เรียงตามลำดับที่วัด)
+        self.delivery = None
+        self.subscriber_stopped = False
+
+    def knob_to_load(self, knob):
+        """แปลงค่าที่ปรับ (devices หรือ interval) เป็น (devices, interval)"""
+        if self.args.vary == "devices":
+            return knob, self.args.interval
+        return self.args.devices, knob
+
+    def harder(self, knob):
+        """ค่าถัดไปในช่วง ramp (โหลดเพิ่มขึ้น)"""
+        if self.args.vary == "devices":
+            return max(knob + 1, int(knob * self.args.growth))
+        return max(1, min(knob - 1, int(knob / self.args.growth)))
+
+    def run_step(self, knob):
+        """รันโหลดหนึ่งขั้นแล้วคืนผลวัด"""
+        args = self.args
+        devices, interval = self.knob_to_load(knob)
+        step = len(self.points)
+        prefix = f"{args.device_prefix}_S{step}"
+
+        fleet = FleetState(devices, device_prefix=prefix, faculty=args.faculty,
+                           data_interval=interval, connections=args.connections)
+        for index in range(fleet.size):
+            fleet.registered[index] = 1
+
+        simulator = FleetSimulator(fleet, broker_host=args.broker_host, broker_port=args.broker_port,
+                                   dry_run=args.dry_run, qos=args.qos)
+        duration = args.step_duration or max(10, 3 * interval)
+
+        simulator.connect()
+        try:
+            simulator.run_for(time.time() + 1, duration, drain_timeout=args.drain_timeout)
+        finally:
+            simulator.disconnect()
+
+        counters = simulator.counters
+        published = counters["published"]
+        latency = simulator.latency.summary()
+        point = {
+            "step": step,
+            "devices": devices,
+            "interval": interval,
+            "target_msg_per_s": round(devices / interval, 1),
+            "published_per_s": round(published / duration, 1),
+            "acked_per_s": round(counters["acked"] / duration, 1),
+            "p50_ms": latency["p50_ms"],
+            "p99_ms": latency["p99_ms"],
+            "backlog": simulator.backlog_at_end,
+            "unacked": simulator.inflight,
+            "publish_errors": counters["publish_errors"],
+        }
+
+        if self.delivery and published:
+            time.sleep(args.drain_timeout / 2)  # ให้ข้อความที่ค้างใน broker ส่งถึง subscriber
+            point["loss"] = round(max(0.0, 1 - self.delivery.received(prefix) / published), 4)
+            point["received_per_s"] = round(self.delivery.receive_rate(prefix, duration), 1)
+        else:
+            point["loss"] = None
+            point["received_per_s"] = None
+
+        point["generator_limited"] = point["published_per_s"] < 0.9 * point["target_msg_per_s"]
+        point["subscriber_limited"] = self.subscriber_limited(point)
+        point["pass"], point["violations"] = self.check_slo(point)
+        # loss ที่วัดผ่าน subscriber ที่รับไม่ทัน แยกไม่ได้ว่าเป็นของ broker หรือของ subscriber
+        point["inconclusive"] = point["subscriber_limited"] and point["violations"] == ["loss"]
+        self.points.append(point)
+
+        if point["inconclusive"]:
+            status = "⚠️ inconclusive (subscriber limited)"
+        else:
+            status = "✅" if point["pass"] else "❌ " + ", ".join(point["violations"])
+        print(f"{step:>4} | {devices:>8} | {interval:>4}s | {point['target_msg_per_s']:>9} | "
+              f"{point['acked_per_s']:>9} | {str(point['received_per_s']):>9} | {str(point['p99_ms']):>8} | "
+              f"{point['backlog']:>7} | {str(point['loss']):>7} | {status}")
+        return point
+
+    def subscriber_limited(self, point):
+        """subscriber รับได้ไม่เพิ่มจากขั้นก่อน ๆ ทั้งที่ broker ACK มากขึ้น
+
+        อาจเป็นได้ทั้ง subscriber รับไม่ทัน หรือ broker fan-out เต็มจริง จึงใช้ตัดสิน loss ไม่ได้
+        """
+        received = point["received_per_s"]
+        if received is None or received >= 0.95 * point["acked_per_s"]:
+            return False
+        previous = [p["received_per_s"] for p in self.points if p["received_per_s"]]
+        return bool(previous) and received < 1.1 * max(previous)
+
+    def check_slo(self, point):
+        args = self.args
+        violations = []
+        if point["p99_ms"] is not None and point["p99_ms"] > args.slo_p99_ms:
+            violations.append("p99")
+        if point["backlog"] > args.slo_max_backlog:
+            violations.append("backlog")
+        if point["loss"] is not None and point["loss"] > args.slo_max_loss:
+            violations.append("loss")
+        if point["publish_errors"]:
+            violations.append("errors")
+        if point["acked_per_s"] < 0.95 * point["published_per_s"]:
+            violations.append("ack rate")
+        return not violations, violations
+
+    def search(self):
+        """ramp จนผิด SLO แล้ว binary search ระหว่างขั้นที่ผ่านล่าสุดกับขั้นที่ผิด"""
+        args = self.args
+        knob = args.start_devices if args.vary == "devices" else args.start_interval
+        passed, failed = None, None
+
+        for _ in range(args.max_steps):
+            point = self.run_step(knob)
+            if point["inconclusive"]:
+                self.stop_inconclusive()
+                break
+            if not point["pass"]:
+                failed = knob
+                break
+            passed = knob
+            if point["generator_limited"]:
+                # เพิ่มโหลดต่อไปก็ไม่ได้วัด broker แล้ว แต่วัดตัวสร้างโหลดเอง
+                print("⚠️ ตัวสร้างโหลดส่งได้ไม่ถึงเป้า - หยุด ramp")
+                break
+            next_knob = self.harder(knob)
+            if next_knob == knob:
+                break
+            knob = next_knob
+
+        if failed is None or passed is None:
+            return passed
+
+        print("\n🔎 Binary search หา knee")
+        while abs(failed - passed) > max(1, abs(passed) * args.resolution):
+            middle = (passed + failed) // 2
+            if middle in (passed, failed):
+                break
+            point = self.run_step(middle)
+            if point["inconclusive"]:
+                self.stop_inconclusive()
+                break
+            if point["pass"]:
+                passed = middle
+            else:
+                failed = middle
+        return passed
+
+    def stop_inconclusive(self):
+        """หยุดที่ขั้นที่ผ่านล่าสุด (เหมือน generator limited) แทนการข้าม --slo-max-loss"""
+        self.subscriber_stopped = True
+        print("⚠️ subscriber ที่นับ delivery รับไม่ทัน - วัด loss ต่อไม่ได้ หยุดที่ขั้นที่ผ่านล่าสุด")
+
+    def run(self):
+        args = self.args
+        print("📈 Capacity Finder")
+        print(f"🎯 SLO: p99 ≤ {args.slo_p99_ms} ms | backlog ≤ {args.slo_max_backlog} | loss ≤ {args.slo_max_loss:.2%}")
+        print(f"{'step':>4} | {'devices':>8} | {'int':>5} | {'target/s':>9} | {'acked/s':>9} | {'recv/s':>9} | "
+              f"{'p99 ms':>8} | {'backlog':>7} | {'loss':>7} | SLO")
+        print("-" * 102)
+
+        if args.verify_delivery and not args.dry_run:
+            self.delivery = DeliveryCounter(args.faculty, args.broker_host, args.broker_port)
+            self.delivery.start()
+
+        try:
+            best = self.search()
+        finally:
+            if self.delivery:
+                self.delivery.stop()
+
+        return self.report(best)
+
+    def report(self, best):
+        best_point = None
+        if best is not None:
+            devices, interval = self.knob_to_load(best)
+            best_point = max(
+                (p for p in self.points if p["pass"] and (p["devices"], p["interval"]) == (devices, interval)),
+                key=lambda p: p["acked_per_s"],
+            )
+
+        result = {
+            "slo": {
+                "p99_ms": self.args.slo_p99_ms,
+                "max_backlog": self.args.slo_max_backlog,
+                "max_loss": self.args.slo_max_loss,
+            },
+            "qos": self.args.qos,
+            "vary": self.args.vary,
+            "max_sustainable": best_point and {
+                "msg_per_s": best_point["acked_per_s"],
+                "devices": best_point["devices"],
+                "interval": best_point["interval"],
+                "generator_limited": best_point["generator_limited"],
+                "subscriber_limited": self.subscriber_stopped,
+            },
+            "curve": sorted(self.points, key=lambda p: p["target_msg_per_s"]),
+        }
+
+        print("\n📋 ผลลัพธ์")
+        if best_point:
+            print(f"✅ Max sustainable: {best_point['acked_per_s']} msg/s "
+                  f"({best_point['devices']} devices / {best_point['interval']} s)")
+            if best_point["generator_limited"]:
+                print("⚠️ ตัวสร้างโหลดส่งได้ไม่ถึงเป้า - ค่านี้เป็นขอบล่าง ลองใช้ load_coordinator.py หลายเครื่อง")
+            if self.subscriber_stopped:
+                print("⚠️ subscriber ที่นับ delivery รับไม่ทัน - ค่านี้เป็นขอบล่าง "
+                      "ลองใช้ subscriber ที่เร็วกว่า หรือ --no-verify-delivery")
+        else:
+            print("❌ ขั้นแรกก็ผิด SLO แล้ว - ลดค่าเริ่มต้นลง")
+        return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Closed-loop capacity finder")
+    parser.add_argument("--vary", choices=("devices", "interval"), default="devices",
+                        help="เพิ่มโหลดด้วยจำนวนอุปกรณ์ หรือ data_interval ที่สั้นลง")
+    parser.add_argument("--start-devices", type=int, default=100)
+    parser.add_argument("--devices", type=int, default=1000, help="จำนวนอุปกรณ์คงที่ (--vary interval)")
+    parser.add_argument("--interval", type=int, default=int(os.getenv("DATA_INTERVAL", "15")),
+                        help="data_interval คงที่ (--vary devices)")
+    parser.add_argument("--start-interval", type=int, default=60)
+    parser.add_argument("--growth", type=float, default=2.0, help="ตัวคูณโหลดต่อขั้นในช่วง ramp")
+    parser.add_argument("--max-steps", type=int, default=12)
+    parser.add_argument("--resolution", type=float, default=0.05, help="หยุด binary search เมื่อช่วงแคบกว่าสัดส่วนนี้")
+    parser.add_argument("--step-duration", type=float, default=None, help="วินาทีต่อขั้น (default: 3 × interval)")
+    parser.add_argument("--drain-timeout", type=float, default=10)
+    parser.add_argument("--slo-p99-ms", type=float, default=500)
+    parser.add_argument("--slo-max-backlog", type=int, default=1000)
+    parser.add_argument("--slo-max-loss", type=float, default=0.001)
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=1)
+    parser.add_argument("--connections", type=int, default=int(os.getenv("FLEET_CONNECTIONS", "4")))
+    parser.add_argument("--device-prefix", default="ESP32_CAP")
+    parser.add_argument("--faculty", default=os.getenv("FACULTY", "engineering"))
+    parser.add_argument("--broker-host", default=None)
+    parser.add_argument("--broker-port", type=int, default=None)
+    parser.add_argument("--no-verify-delivery", dest="verify_delivery", action="store_false",
+                        help="ไม่ subscribe เพื่อนับ delivery loss")
+    parser.add_argument("--dry-run", action="store_true", help="ไม่ส่งจริง (ทดสอบ ramp / search)")
+    parser.add_argument("--output", help="บันทึก curve และผลลัพธ์เป็นไฟล์ JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = CapacityFinder(args).run()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"💾 บันทึกผลลัพธ์: {args.output}")
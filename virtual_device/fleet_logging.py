@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Fleet Logging - structured logging แบบ non-blocking และ sampling
+
+แทนการ print() ทุกครั้งที่ publish / รับ config:
+- QueueHandler บน hot path แค่ใส่ record ลง queue ส่วนการ format / เขียนอยู่ใน QueueListener thread
+  (publish loop ไม่รอ I/O แต่ listener ยังใช้ GIL ร่วมกัน: ต้นทุน CPU ลดได้ด้วย sampling เท่านั้น)
+- เขียนเป็น JSON หนึ่งบรรทัดต่อ event (stdout หรือ LOG_FILE)
+- event ต่อข้อความ (publish) ถูก sample ตาม LOG_SAMPLE_RATE แต่ยังนับครบทุกครั้ง
+- สรุปภาพรวมหนึ่งบรรทัดทุก LOG_SUMMARY_INTERVAL วินาที
+
+Environment:
+    LOG_LEVEL=INFO  LOG_SAMPLE_RATE=0.01  LOG_SUMMARY_INTERVAL=10  LOG_FILE=
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+_listener = None
+_queue_handler = None
+
+
+class JsonLineFormatter(logging.Formatter):
+    """แปลง LogRecord เป็น JSON หนึ่งบรรทัด"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", record.getMessage()),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _EnqueueOnlyHandler(logging.handlers.QueueHandler):
+    """QueueHandler ที่ไม่ format บน thread ของผู้เรียก
+
+    prepare() เดิม format ข้อความและ copy record ก่อนใส่ queue (ต้นทุนอยู่บน hot path)
+    queue นี้อยู่ใน process เดียวกัน จึงส่ง record เดิมไปให้ listener format ได้เลย
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level=None, log_file=None):
+    """ติดตั้ง QueueHandler ที่ root logger และเริ่ม QueueListener (เรียกซ้ำได้)"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    log_file = log_file or os.getenv("LOG_FILE")
+
+    if log_file:
+        output = logging.FileHandler(log_file, encoding='utf-8')
+    else:
+        output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonLineFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    _queue_handler = _EnqueueOnlyHandler(log_queue)
+    root.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """flush queue และหยุด listener"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
+
+
+class StructuredLogger:
+    def __init__(self, name, sample_rate=None):
+        self.logger = logging.getLogger(name)
+        if sample_rate is None:
+            sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+        self.sample_rate = sample_rate
+        self.counters = {}
+        self._summary_thread = None
+        self._summary_stop = threading.Event()
+
+    def event(self, event, level=logging.INFO, **fields):
+        """บันทึก event (ไม่ sample) เช่น การเชื่อมต่อ การอนุมัติ หรือ error"""
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, event, extra={"event": event, "fields": fields})
+
+    def sampled(self, event, **fields):
+        """นับ event ทุกครั้ง แต่บันทึกจริงเฉพาะตาม sample_rate"""
+        self.counters[event] = self.counters.get(event, 0) + 1
+        if self.sample_rate and random.random() < self.sample_rate:
+            self.event(event, sampled=True, sample_rate=self.sample_rate, **fields)
+
+    def start_summary(self, interval=None, extra=None):
+        """เริ่ม thread ที่บันทึกสรุปหนึ่งบรรทัดทุก interval วินาที
+
+        extra: callable ที่คืน dict ของค่าเพิ่มเติม (เช่น จำนวนอุปกรณ์ที่ลงทะเบียนแล้ว)
+        """
+        if interval is None:
+            interval = float(os.getenv("LOG_SUMMARY_INTERVAL", "10"))
+
+        def report():
+            last_counters = {}
+            last_time = time.time()
+            while not self._summary_stop.wait(interval):
+                now = time.time()
+                counters = dict(self.counters)
+                elapsed = now - last_time
+                rates = {
+                    f"{key}_per_s": round((value - last_counters.get(key, 0)) / elapsed, 1)
+                    for key, value in counters.items()
+                }
+                self.event("summary", **counters, **rates, **(extra() if extra else {}))
+                last_counters, last_time = counters, now
+
+        self._summary_stop.clear()
+        self._summary_thread = threading.Thread(target=report, daemon=True)
+        self._summary_thread.start()
+
+    def stop_summary(self):
+        self._summary_stop.set()
+        if self._summary_thread:
+            self._summary_thread.join()
+            self._summary_thread = None
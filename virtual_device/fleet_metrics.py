@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Fleet Metrics - ตัวนับและ latency histogram ที่ merge ข้ามเครื่องได้
+
+LatencyHistogram เก็บค่าเป็น bucket แบบ logarithmic (ความละเอียด ~5%)
+จึงส่งผ่าน JSON และรวมผลจากหลาย worker ได้โดยไม่ต้องเก็บค่าดิบทุกตัว
+"""
+
+import math
+
+BUCKET_BASE = 1.05
+_LOG_BASE = math.log(BUCKET_BASE)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=None):
+        # bucket index -> จำนวนครั้ง (index 0 = ต่ำกว่า 1 ms)
+        self.buckets = {int(k): v for k, v in (buckets or {}).items()}
+        self.count = sum(self.buckets.values())
+
+    def record(self, latency_ms):
+        """บันทึก latency หนึ่งค่า (มิลลิวินาที)"""
+        index = 0 if latency_ms < 1 else int(math.log(latency_ms) / _LOG_BASE) + 1
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+
+    def merge(self, other):
+        """รวม histogram อื่นเข้ามา"""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+
+    def percentile(self, p):
+        """ค่า latency (ms) ที่ percentile p (0-100) โดยใช้ขอบบนของ bucket"""
+        if self.count == 0:
+            return None
+        target = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return 1.0 if index == 0 else round(BUCKET_BASE ** index, 2)
+        return None
+
+    def summary(self):
+        """สรุป p50/p90/p99/max สำหรับรายงาน"""
+        return {
+            "count": self.count,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.percentile(100),
+        }
+
+    def to_dict(self):
+        return {str(k): v for k, v in self.buckets.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data)
+
+
+def percentile(values, p):
+    """percentile แบบ nearest-rank ของ list ค่าดิบ"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(len(ordered) * p / 100))
+    return ordered[rank - 1]
+
+
+def merge_counters(total, counters):
+    """บวกตัวนับ dict เข้ากับ total"""
+    for key, value in counters.items():
+        total[key] = total.get(key, 0) + value
+    return total
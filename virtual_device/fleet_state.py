@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Fleet State - จำลองมิเตอร์จำนวนมาก (100k+) แบบ struct-of-arrays
+
+แทนที่จะสร้าง VirtualDevice หนึ่ง object ต่ออุปกรณ์ (client, thread 2 ตัว, topic 3 string,
+device_config dict) สถานะของแต่ละอุปกรณ์จะถูกเก็บใน typed array ที่ index ด้วยหมายเลขอุปกรณ์:
+- registered     : สถานะลงทะเบียน (0/1)
+- interval       : ช่วงเวลาส่งข้อมูล (วินาที)
+- next_deadline  : เวลาที่ต้องส่งครั้งถัดไป
+- sequence       : sequence_number ของ /data
+- energy_import  : ตัวนับพลังงานสะสม (Wh)
+- connection     : index ของ MQTT connection ที่ใช้ส่ง
+
+device_id และ topic ถูกคำนวณจาก index เมื่อต้องใช้เท่านั้น
+/config ที่ได้รับจากเว็บไม่ถูกเก็บ ใช้เฉพาะ data_collection_interval (เก็บใน interval)
+"""
+
+import json
+import logging
+import time
+import random
+import os
+import threading
+from array import array
+from datetime import datetime, timezone
+import paho.mqtt.client as mqtt
+from dotenv import load_dotenv
+
+from virtual_device_with_config_file import PROP_INTERVAL, build_prop_payload, build_data_payload
+from fleet_metrics import LatencyHistogram
+from fleet_logging import StructuredLogger, configure_logging, shutdown_logging
+
+# Load environment variables
+load_dotenv()
+
+
+class FleetState:
+    def __init__(self, size, device_prefix="ESP32_SIM", faculty="engineering",
+                 data_interval=15, connections=1, offset=0, prop_interval=PROP_INTERVAL):
+        self.size = size
+        self.prop_interval = prop_interval
+        self.offset = offset  # หมายเลขอุปกรณ์ตัวแรก (ใช้แบ่งช่วงอุปกรณ์ระหว่าง worker)
+        self.device_prefix = device_prefix
+        self.faculty = faculty
+        self.id_width = max(6, len(str(offset + size - 1)))
+
+        # Per-device state (typed arrays, index = หมายเลขอุปกรณ์)
+        self.registered = array('b', bytes(size))
+        self.interval = array('H', [data_interval]) * size
+        self.next_deadline = array('d', [0.0]) * size
+        self.sequence = array('I', [0]) * size
+        self.energy_import = array('d', [0.0]) * size
+        self.connection = array('H', (i % connections for i in range(size)))
+
+        # Timing wheel: วินาที (int) -> array ของ index ที่ถึงกำหนดในวินาทีนั้น
+        self._buckets = {}
+
+    def device_id(self, index):
+        """แปลง index เป็น device_id"""
+        return f"{self.device_prefix}_{self.offset + index:0{self.id_width}d}"
+
+    def index_of(self, device_id):
+        """แปลง device_id กลับเป็น index (None ถ้าไม่ใช่อุปกรณ์ใน fleet นี้)"""
+        prefix, _, number = device_id.rpartition('_')
+        if prefix != self.device_prefix or not number.isdigit():
+            return None
+        index = int(number) - self.offset
+        return index if 0 <= index < self.size else None
+
+    def topic(self, index, kind):
+        """สร้าง topic devices/{faculty}/{device_id}/{kind}"""
+        return f"devices/{self.faculty}/{self.device_id(index)}/{kind}"
+
+    def mark_registered(self, index, config=None):
+        """บันทึกการอนุมัติจากเว็บ (เทียบเท่า handle_config_message)
+
+        ไม่เก็บ config dict (~1.6 KB ต่ออุปกรณ์) เก็บเฉพาะ data_collection_interval
+        """
+        self.registered[index] = 1
+        if config:
+            device_config = config.get('device_configuration', {})
+            if device_config.get('data_collection_interval'):
+                self.interval[index] = int(device_config['data_collection_interval'])
+
+    def schedule(self, index, deadline):
+        """ตั้งเวลาส่งครั้งถัดไปของอุปกรณ์"""
+        self.next_deadline[index] = deadline
+        key = int(deadline)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = array('I')
+        bucket.append(index)
+
+    def schedule_all(self, start, spread=True):
+        """ตั้งเวลาเริ่มต้นของทุกอุปกรณ์ โดยกระจายให้ไม่ส่งพร้อมกัน (spread=False = เปิดเครื่องพร้อมกัน)"""
+        for index in range(self.size):
+            offset = random.uniform(0, self.next_period(index)) if spread else 0.0
+            self.schedule(index, start + offset)
+
+    def pop_due(self, now):
+        """คืน index ของอุปกรณ์ที่ถึงกำหนดส่ง ณ เวลา now"""
+        due = array('I')
+        for key in sorted(k for k in self._buckets if k <= int(now)):
+            bucket = self._buckets.pop(key)
+            if key < int(now):
+                due.extend(bucket)
+                continue
+            # bucket ของวินาทีปัจจุบัน: แยกส่วนที่ยังไม่ถึงเวลาคืนไว้
+            remaining = array('I')
+            for index in bucket:
+                (due if self.next_deadline[index] <= now else remaining).append(index)
+            if remaining:
+                self._buckets[key] = remaining
+        return due
+
+    def next_period(self, index):
+        """ช่วงเวลาถึงการส่งครั้งถัดไปตามสถานะปัจจุบัน"""
+        return self.interval[index] if self.registered[index] else self.prop_interval
+
+    def generate_prop_data(self, index, timestamp=None):
+        """สร้าง /prop payload ของอุปกรณ์ index"""
+        return build_prop_payload(self.device_id(index), self.interval[index], timestamp)
+
+    def generate_data(self, index, timestamp=None):
+        """สร้าง /data payload และอัปเดต sequence / ตัวนับพลังงาน"""
+        self.sequence[index] += 1
+        data = build_data_payload(
+            self.device_id(index),
+            self.interval[index],
+            timestamp,
+            sequence_number=self.sequence[index],
+            total_energy=0.0,
+        )
+
+        # สะสมพลังงานจาก active_power ตลอดช่วง interval (Wh)
+        active_power = data['electrical_measurements']['active_power']
+        self.energy_import[index] += active_power * self.interval[index] / 3600
+        total_energy = round(self.energy_import[index], 3)
+        data['electrical_measurements']['total_energy'] = total_energy
+        data['energy_measurements']['total_energy_import'] = total_energy
+        return data
+
+
+class FleetSimulator:
+    """ส่ง /prop และ /data ของทั้ง fleet ผ่าน MQTT connection จำนวนน้อย"""
+
+    def __init__(self, fleet, broker_host=None, broker_port=None, dry_run=False, sample_rate=None, qos=1):
+        self.fleet = fleet
+        self.qos = qos  # QoS1: latency = เวลาถึง PUBACK, QoS0: เวลาถึงการเขียนลง socket
+        self.log = StructuredLogger("fleet", sample_rate)
+        self.dry_run = dry_run  # ไม่ส่งจริง ใช้ทดสอบ scheduler / control plane
+
+        # MQTT Configuration
+        self.broker_host = broker_host or os.getenv("MQTT_BROKER_HOST", "iot666.ddns.net")
+        self.broker_port = int(broker_port or os.getenv("MQTT_BROKER_PORT", "1883"))
+        self.username = os.getenv("MQTT_USERNAME", "electric_energy")
+        self.password = os.getenv("MQTT_PASSWORD", "electric_energy")
+
+        self.running = True
+        self.counters = {"published": 0, "acked": 0, "publish_errors": 0, "configs_received": 0}
+        self.latency = LatencyHistogram()
+        self.backlog_at_end = 0
+
+        # PUBACK tracking: (connection, mid) -> เวลาที่ publish
+        self._inflight = {}
+        self._early_acks = {}
+        self._lock = threading.Lock()
+
+        connections = max(fleet.connection) + 1 if fleet.size else 1
+        self.clients = []
+        for conn in range(connections):
+            client = mqtt.Client(client_id=f"{fleet.device_prefix}_{fleet.offset}_conn_{conn}",
+                                 userdata=conn)
+            client.username_pw_set(self.username, self.password)
+            client.max_queued_messages_set(0)
+            client.max_inflight_messages_set(int(os.getenv("FLEET_MAX_INFLIGHT", "1000")))
+            client.on_publish = self.on_publish
+            self.clients.append(client)
+
+        # รับ /config ของทั้ง fleet ผ่าน connection แรกเท่านั้น
+        self.config_topic = f"devices/{fleet.faculty}/+/config"
+        self.clients[0].on_connect = self.on_connect
+        self.clients[0].on_subscribe = self.on_subscribe
+        self.clients[0].on_message = self.on_message
+        self.subscribed = threading.Event()  # set เมื่อ broker ตอบ SUBACK ของ /config
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(self.config_topic, qos=1)
+            print(f"📡 Subscribe: {self.config_topic}")
+        else:
+            print(f"❌ การเชื่อมต่อ MQTT ล้มเหลว: {rc}")
+
+    def on_subscribe(self, client, userdata, mid, granted_qos):
+        self.subscribed.set()
+
+    def on_message(self, client, userdata, msg):
+        try:
+            device_id = msg.topic.split('/')[2]
+            index = self.fleet.index_of(device_id)
+            if index is not None:
+                self.fleet.mark_registered(index, json.loads(msg.payload.decode()))
+                self.counters["configs_received"] += 1
+                self.on_config_received(index)
+                self.log.sampled("config_received", device_id=device_id)
+        except Exception as e:
+            self.log.event("message_error", level=logging.ERROR, topic=msg.topic, error=str(e))
+
+    def on_prop_published(self, index):
+        """hook: เรียกทุกครั้งที่อุปกรณ์ index ส่ง /prop (ให้ subclass ใช้วัดผล)"""
+
+    def on_config_received(self, index):
+        """hook: เรียกเมื่ออุปกรณ์ index ได้รับ /config"""
+
+    def on_publish(self, client, userdata, mid):
+        """PUBACK (QoS1) -> บันทึก latency"""
+        now = time.perf_counter()
+        with self._lock:
+            sent_at = self._inflight.pop((userdata, mid), None)
+            if sent_at is None:
+                # PUBACK มาถึงก่อนที่ publish() จะคืนค่า mid
+                self._early_acks[(userdata, mid)] = now
+                return
+            self._record_ack(sent_at, now)
+
+    def _record_ack(self, sent_at, acked_at):
+        """เรียกขณะถือ self._lock (on_publish มาจาก loop thread ของทุก connection)"""
+        self.counters["acked"] += 1
+        self.latency.record((acked_at - sent_at) * 1000)
+
+    @property
+    def inflight(self):
+        """จำนวนข้อความที่ publish แล้วแต่ยังไม่ได้ PUBACK"""
+        return len(self._inflight)
+
+    def publish(self, conn, topic, payload):
+        """publish และจดเวลาไว้รอ PUBACK"""
+        self.counters["published"] += 1
+        if self.dry_run:
+            self.counters["acked"] += 1
+            return
+
+        sent_at = time.perf_counter()
+        info = self.clients[conn].publish(topic, payload, qos=self.qos)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            self.counters["publish_errors"] += 1
+            return
+
+        with self._lock:
+            acked_at = self._early_acks.pop((conn, info.mid), None)
+            if acked_at is None:
+                self._inflight[(conn, info.mid)] = sent_at
+                return
+            self._record_ack(sent_at, acked_at)
+
+    def tick(self, now):
+        """ส่งข้อความของทุกอุปกรณ์ที่ถึงกำหนด แล้วตั้งเวลาครั้งถัดไป"""
+        fleet = self.fleet
+        timestamp = datetime.now(timezone.utc).isoformat()
+        for index in fleet.pop_due(now):
+            if fleet.registered[index]:
+                topic = fleet.topic(index, "data")
+                payload = fleet.generate_data(index, timestamp)
+            else:
+                topic = fleet.topic(index, "prop")
+                payload = fleet.generate_prop_data(index, timestamp)
+                self.on_prop_published(index)
+
+            self.publish(fleet.connection[index], topic, json.dumps(payload, ensure_ascii=False))
+            self.log.sampled("published", topic=topic)
+            fleet.schedule(index, fleet.next_deadline[index] + fleet.next_period(index))
+
+    def connect(self):
+        """เชื่อมต่อทุก connection (ยกเว้น dry run)"""
+        if self.dry_run:
+            return
+        for client in self.clients:
+            client.connect(self.broker_host, self.broker_port, 60)
+            client.loop_start()
+
+    def disconnect(self):
+        if self.dry_run:
+            return
+        for client in self.clients:
+            client.loop_stop()
+            client.disconnect()
+
+    def run_for(self, start_at, duration, tick_interval=0.1, drain_timeout=10, spread=True, stop_when=None):
+        """รันตั้งแต่ start_at (epoch) เป็นเวลา duration วินาที แล้วรอ PUBACK ที่ค้าง
+
+        stop_when: callable ที่คืน True เมื่อต้องการหยุดก่อนครบ duration
+        """
+        self.fleet.schedule_all(start_at, spread)
+        while time.time() < start_at:
+            time.sleep(min(tick_interval, max(0.0, start_at - time.time())))
+
+        end_at = start_at + duration
+        while self.running and time.time() < end_at:
+            self.tick(time.time())
+            if stop_when and stop_when():
+                break
+            time.sleep(tick_interval)
+
+        self.backlog_at_end = self.inflight
+        drain_deadline = time.time() + drain_timeout
+        while self.inflight and time.time() < drain_deadline:
+            time.sleep(0.05)
+
+    def stats(self):
+        """ตัวนับและ histogram ในรูปแบบ JSON-serializable"""
+        with self._lock:
+            return {
+                "counters": dict(self.counters, inflight=self.inflight, backlog_at_end=self.backlog_at_end),
+                "latency_histogram": self.latency.to_dict(),
+            }
+
+    def summary_fields(self):
+        """ค่าสำหรับ summary หนึ่งบรรทัดของ fleet"""
+        with self._lock:
+            return {
+                "registered": sum(self.fleet.registered),
+                "devices": self.fleet.size,
+                "acked": self.counters["acked"],
+                "publish_errors": self.counters["publish_errors"],
+                "inflight": self.inflight,
+                "puback_p99_ms": self.latency.percentile(99),
+            }
+
+    def run(self, tick_interval=0.1):
+        """รัน fleet จนกว่าจะกด Ctrl+C"""
+        fleet = self.fleet
+        try:
+            print("🚀 เริ่มต้น Fleet Simulator")
+            print(f"📱 Devices: {fleet.size} ({fleet.device_id(0)} ...)")
+            print(f"🔌 Connections: {len(self.clients)}")
+            print(f"🌐 MQTT Broker: {self.broker_host}:{self.broker_port}")
+
+            configure_logging()
+            self.log.start_summary(extra=self.summary_fields)
+            self.connect()
+            fleet.schedule_all(time.time())
+            print("\nกด Ctrl+C เพื่อหยุด\n")
+
+            while self.running:
+                self.tick(time.time())
+                time.sleep(tick_interval)
+
+        except KeyboardInterrupt:
+            print("\n\n🛑 หยุดการทำงาน...")
+            self.running = False
+            self.disconnect()
+
+        except Exception as e:
+            print(f"❌ Error: {e}")
+
+        finally:
+            self.log.stop_summary()
+            shutdown_logging()
+
+
+if __name__ == "__main__":
+    fleet = FleetState(
+        int(os.getenv("FLEET_SIZE", "1000")),
+        device_prefix=os.getenv("FLEET_DEVICE_PREFIX", "ESP32_SIM"),
+        faculty=os.getenv("FACULTY", "engineering"),
+        data_interval=int(os.getenv("DATA_INTERVAL", "15")),
+        connections=int(os.getenv("FLEET_CONNECTIONS", "4")),
+    )
+    FleetSimulator(fleet).run()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Distributed Load Coordinator
+แบ่ง fleet ให้ worker หลายเครื่องช่วยกันสร้างโหลด แล้วรวมผลเป็นรายงานเดียว
+
+Workflow:
+1. รอ worker (load_worker.py) ลงทะเบียนครบตามจำนวน
+2. วัด clock offset ของแต่ละ worker (ping/pong)
+3. แบ่งช่วงหมายเลขอุปกรณ์ตาม fleet manifest แล้วส่ง start พร้อมเวลาเริ่มร่วมกัน
+4. รับ counters + latency histogram จากทุก worker แล้ว merge
+
+Control protocol: JSON หนึ่งบรรทัดต่อข้อความผ่าน TCP
+    register -> ping/pong -> start -> report
+
+Usage:
+    python load_coordinator.py load_manifest_example.json load_scenario_example.json --workers 3
+"""
+
+import argparse
+import json
+import socket
+import sys
+import time
+
+from fleet_metrics import LatencyHistogram, merge_counters
+
+DEFAULT_PORT = 7070
+PING_TIMEOUT = 10    # วินาทีที่รอ pong แต่ละครั้ง
+REPORT_MARGIN = 30   # วินาทีเผื่อ connect / สร้าง fleet / ส่งรายงาน หลังจบ duration + drain
+
+
+def send_message(stream, message):
+    """ส่ง JSON หนึ่งบรรทัด"""
+    stream.write(json.dumps(message) + "\n")
+    stream.flush()
+
+
+def recv_message(stream):
+    """อ่าน JSON หนึ่งบรรทัด (None เมื่อปลายทางปิด connection หรือหมดเวลารอ)"""
+    try:
+        line = stream.readline()
+    except OSError:  # รวม socket.timeout และ connection reset
+        return None
+    return json.loads(line) if line else None
+
+
+def split_ranges(total, workers):
+    """แบ่ง total อุปกรณ์เป็นช่วง (offset, size) ให้ worker แต่ละตัวใกล้เคียงกัน"""
+    base, extra = divmod(total, workers)
+    ranges = []
+    offset = 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        ranges.append((offset, size))
+        offset += size
+    return ranges
+
+
+class LoadCoordinator:
+    def __init__(self, manifest, scenario, expected_workers, host="127.0.0.1", port=DEFAULT_PORT):
+        self.manifest = manifest
+        self.scenario = scenario
+        self.expected_workers = expected_workers
+        self.host = host
+        self.port = port
+        self.workers = []  # [{"worker_id", "conn", "stream", "clock_offset"}]
+        self.server = None
+
+    def listen(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+        print(f"🎛️ Coordinator รอ worker ที่ {self.host}:{self.port}")
+
+    def wait_for_workers(self, timeout=60):
+        """รอ worker ลงทะเบียนจนครบ expected_workers (TimeoutError ถ้าไม่ครบภายใน timeout)"""
+        deadline = time.time() + timeout
+        while len(self.workers) < self.expected_workers:
+            self.server.settimeout(max(0.0, deadline - time.time()))
+            try:
+                conn, address = self.server.accept()
+            except socket.timeout:
+                raise TimeoutError(
+                    f"worker ลงทะเบียนเพียง {len(self.workers)}/{self.expected_workers} ภายใน {timeout} วินาที"
+                ) from None
+            # ข้อความ register ต้องมาก่อนหมดเวลาลงทะเบียนเช่นกัน
+            conn.settimeout(max(0.1, deadline - time.time()))
+            stream = conn.makefile('rw', encoding='utf-8')
+            message = recv_message(stream)
+            if not message or message.get("type") != "register":
+                conn.close()
+                continue
+
+            worker_id = message.get("worker_id") or f"{address[0]}:{address[1]}"
+            self.workers.append({"worker_id": worker_id, "conn": conn, "stream": stream})
+            print(f"✅ Worker ลงทะเบียน: {worker_id} ({len(self.workers)}/{self.expected_workers})")
+
+    def sync_clocks(self, rounds=5):
+        """ประมาณ clock offset ของ worker จาก round trip ที่สั้นที่สุด
+
+        worker ที่หลุดหรือไม่ตอบ pong จะถูกตัดออก (อุปกรณ์จะถูกแบ่งให้ worker ที่เหลือ)
+        """
+        for worker in list(self.workers):
+            worker["conn"].settimeout(PING_TIMEOUT)
+            best = None
+            for _ in range(rounds):
+                sent_at = time.time()
+                try:
+                    send_message(worker["stream"], {"type": "ping"})
+                except OSError:
+                    reply = None
+                else:
+                    reply = recv_message(worker["stream"])
+                received_at = time.time()
+                if not reply or reply.get("type") != "pong":
+                    break
+                rtt = received_at - sent_at
+                offset = reply["worker_time"] - (sent_at + received_at) / 2
+                if best is None or rtt < best[0]:
+                    best = (rtt, offset)
+            else:
+                worker["clock_offset"] = best[1]
+                print(f"⏱️ {worker['worker_id']}: offset {best[1] * 1000:+.2f} ms (rtt {best[0] * 1000:.2f} ms)")
+                continue
+
+            print(f"❌ {worker['worker_id']} หลุดระหว่าง sync clock - ตัดออก")
+            worker["conn"].close()
+            self.workers.remove(worker)
+
+        if not self.workers:
+            raise RuntimeError("ไม่มี worker เหลือหลัง sync clock")
+
+    def start(self):
+        """แบ่งช่วงอุปกรณ์และส่งคำสั่ง start พร้อมเวลาเริ่มร่วมกัน"""
+        start_at = time.time() + self.scenario.get("start_delay", 5)
+        ranges = split_ranges(self.manifest["devices"], len(self.workers))
+        for worker, (offset, size) in zip(self.workers, ranges):
+            worker["range"] = [offset, size]
+            send_message(worker["stream"], {
+                "type": "start",
+                "start_at": start_at + worker.get("clock_offset", 0.0),  # เวลาตามนาฬิกาของ worker
+                "offset": offset,
+                "size": size,
+                "manifest": self.manifest,
+                "scenario": self.scenario,
+            })
+            print(f"🚀 {worker['worker_id']}: devices {offset}..{offset + size - 1}")
+        return start_at
+
+    def collect_reports(self, start_at):
+        """รอรายงานจากทุก worker แล้ว merge
+
+        รอไม่เกิน start_at + duration + drain_timeout + REPORT_MARGIN (worker ที่ค้างจะถูกข้าม)
+        """
+        scenario = self.scenario
+        deadline = start_at + scenario.get("duration", 60) + scenario.get("drain_timeout", 10) + REPORT_MARGIN
+        counters = {}
+        latency = LatencyHistogram()
+        per_worker = []
+        for worker in self.workers:
+            worker["conn"].settimeout(max(0.1, deadline - time.time()))
+            message = recv_message(worker["stream"])
+            if not message or message.get("type") != "report":
+                print(f"❌ ไม่ได้รับรายงานจาก {worker['worker_id']}")
+                continue
+
+            worker_latency = LatencyHistogram.from_dict(message["latency_histogram"])
+            merge_counters(counters, message["counters"])
+            latency.merge(worker_latency)
+            per_worker.append({
+                "worker_id": worker["worker_id"],
+                "range": worker["range"],
+                "counters": message["counters"],
+                "latency": worker_latency.summary(),
+            })
+
+        duration = self.scenario.get("duration", 60)
+        return {
+            "manifest": self.manifest,
+            "scenario": self.scenario,
+            "workers": per_worker,
+            "counters": counters,
+            "latency": latency.summary(),
+            "latency_histogram": latency.to_dict(),
+            "published_per_second": round(counters.get("published", 0) / duration, 1),
+            "acked_per_second": round(counters.get("acked", 0) / duration, 1),
+        }
+
+    def close(self):
+        for worker in self.workers:
+            worker["conn"].close()
+        if self.server:
+            self.server.close()
+
+    def run(self, register_timeout=60):
+        try:
+            self.listen()
+            self.wait_for_workers(register_timeout)
+            self.sync_clocks()
+            start_at = self.start()
+            return self.collect_reports(start_at)
+        finally:
+            self.close()
+
+
+def print_report(report):
+    print("\n📋 Load Report")
+    print(f"{'worker':>16} | {'devices':>15} | {'published':>10} | {'acked':>10} | {'p99 ms':>8}")
+    print("-" * 72)
+    for worker in report["workers"]:
+        offset, size = worker["range"]
+        print(f"{worker['worker_id']:>16} | {f'{offset}+{size}':>15} | {worker['counters'].get('published', 0):>10} "
+              f"| {worker['counters'].get('acked', 0):>10} | {str(worker['latency']['p99_ms']):>8}")
+    print("-" * 72)
+    counters = report["counters"]
+    print(f"📤 Published: {counters.get('published', 0)} ({report['published_per_second']} msg/s)")
+    print(f"✅ Acked: {counters.get('acked', 0)} ({report['acked_per_second']} msg/s)")
+    print(f"❌ Errors: {counters.get('publish_errors', 0)} | ⏳ In-flight เมื่อจบ: {counters.get('inflight', 0)}")
+    latency = report["latency"]
+    print(f"⏱️ PUBACK latency: p50 {latency['p50_ms']} | p90 {latency['p90_ms']} | "
+          f"p99 {latency['p99_ms']} | max {latency['max_ms']} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed load coordinator")
+    parser.add_argument("manifest", help="fleet manifest (JSON)")
+    parser.add_argument("scenario", help="scenario (JSON)")
+    parser.add_argument("--workers", type=int, default=1, help="จำนวน worker ที่รอ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--register-timeout", type=float, default=60)
+    parser.add_argument("--output", help="บันทึกรายงานเป็นไฟล์ JSON")
+    args = parser.parse_args()
+
+    with open(args.manifest, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    with open(args.scenario, 'r', encoding='utf-8') as f:
+        scenario = json.load(f)
+
+    coordinator = LoadCoordinator(manifest, scenario, args.workers, args.host, args.port)
+    try:
+        report = coordinator.run(args.register_timeout)
+    except (TimeoutError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 บันทึกรายงาน: {args.output}")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Distributed Load Worker
+รับช่วงอุปกรณ์จาก load_coordinator.py แล้วจำลองด้วย FleetSimulator
+
+Usage:
+    python load_worker.py --coordinator 127.0.0.1:7070 --worker-id worker-1
+"""
+
+import argparse
+import socket
+import time
+
+from fleet_state import FleetState, FleetSimulator
+from load_coordinator import DEFAULT_PORT, send_message, recv_message
+
+
+def build_simulator(message):
+    """สร้าง FleetState/FleetSimulator ตามช่วงอุปกรณ์ที่ได้รับ"""
+    manifest = message["manifest"]
+    scenario = message["scenario"]
+
+    fleet = FleetState(
+        message["size"],
+        device_prefix=manifest.get("device_prefix", "ESP32_SIM"),
+        faculty=manifest.get("faculty", "engineering"),
+        data_interval=manifest.get("data_interval", 15),
+        connections=manifest.get("connections_per_worker", 4),
+        offset=message["offset"],
+    )
+    if manifest.get("preapproved", False):
+        # ข้าม prop phase และส่ง /data ทันที
+        for index in range(fleet.size):
+            fleet.registered[index] = 1
+
+    return FleetSimulator(
+        fleet,
+        broker_host=scenario.get("broker_host"),
+        broker_port=scenario.get("broker_port"),
+        dry_run=scenario.get("dry_run", False),
+    )
+
+
+def run_worker(coordinator_host, coordinator_port, worker_id):
+    conn = socket.create_connection((coordinator_host, coordinator_port))
+    stream = conn.makefile('rw', encoding='utf-8')
+    send_message(stream, {"type": "register", "worker_id": worker_id})
+    print(f"✅ ลงทะเบียนกับ coordinator: {coordinator_host}:{coordinator_port}")
+
+    try:
+        while True:
+            message = recv_message(stream)
+            if message is None:
+                return
+
+            if message["type"] == "ping":
+                send_message(stream, {"type": "pong", "worker_time": time.time()})
+
+            elif message["type"] == "start":
+                scenario = message["scenario"]
+                simulator = build_simulator(message)
+                print(f"🚀 devices {message['offset']}..{message['offset'] + message['size'] - 1} "
+                      f"เริ่มใน {message['start_at'] - time.time():.2f} วินาที")
+
+                # เชื่อมต่อ broker ก่อนเวลาเริ่ม เพื่อไม่ให้เวลา connect ปนในผลวัด
+                simulator.connect()
+                try:
+                    simulator.run_for(
+                        message["start_at"],
+                        scenario.get("duration", 60),
+                        tick_interval=scenario.get("tick_interval", 0.1),
+                        drain_timeout=scenario.get("drain_timeout", 10),
+                    )
+                finally:
+                    simulator.disconnect()
+
+                send_message(stream, dict(simulator.stats(), type="report"))
+                print(f"📊 ส่งรายงานแล้ว: {simulator.counters}")
+                return
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed load worker")
+    parser.add_argument("--coordinator", default=f"127.0.0.1:{DEFAULT_PORT}", help="host:port ของ coordinator")
+    parser.add_argument("--worker-id", default=socket.gethostname())
+    args = parser.parse_args()
+
+    host, _, port = args.coordinator.rpartition(':')
+    run_worker(host, int(port), args.worker_id)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Registration Pipeline Benchmark
+วัดเวลาตั้งแต่ /prop แรกจนได้รับ /config เมื่ออุปกรณ์ใหม่ N ตัวเปิดเครื่องพร้อมกัน
+
+/prop -> devices_pending (mqtt-service.ts) -> admin approval -> /config -> handle_config_message()
+
+ต่ออุปกรณ์บันทึก: เวลาที่ส่ง /prop ครั้งแรก, จำนวนครั้งที่ส่ง /prop ซ้ำ, เวลาที่ได้รับ /config
+แล้วรายงาน registration latency (p50/p90/p99/max) และ throughput
+
+Modes:
+- mqtt    : FleetSimulator กับ broker จริง (ใช้ --auto-approve แทน admin ได้)
+- virtual : VirtualDevice + LocalBroker + AutoApprover ในเวลาจำลอง (ไม่ต้องมี broker)
+
+Usage:
+    python registration_benchmark.py --devices 1000 --auto-approve --approve-delay 2
+    python registration_benchmark.py --mode virtual --devices 500 --approve-delay 60 --approve-rate 1
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from array import array
+
+import paho.mqtt.client as mqtt
+
+from auto_approver import AutoApprover
+from fleet_metrics import percentile
+from fleet_state import FleetState, FleetSimulator
+from sim_clock import RealClock, SimClock, EventScheduler, LocalBroker, LocalClient
+from virtual_device_with_config_file import PROP_INTERVAL, VirtualDevice
+
+SUBSCRIBE_TIMEOUT = 10  # วินาทีที่รอ SUBACK ก่อนเริ่มเปิดเครื่องพร้อมกัน
+
+
+class RegistrationTracker:
+    """เวลาของแต่ละอุปกรณ์ใน typed array (0.0 = ยังไม่เกิดขึ้น)"""
+
+    def __init__(self, size, clock):
+        self.size = size
+        self.clock = clock
+        self.first_prop_at = array('d', [0.0]) * size
+        self.config_at = array('d', [0.0]) * size
+        self.prop_count = array('I', [0]) * size
+        self.registered = 0
+
+    def record_prop(self, index):
+        if not self.prop_count[index]:
+            self.first_prop_at[index] = self.clock.now()
+        self.prop_count[index] += 1
+
+    def record_config(self, index):
+        # mqtt-service ส่ง config ซ้ำได้ เก็บเฉพาะครั้งแรก
+        if not self.config_at[index]:
+            self.config_at[index] = self.clock.now()
+            self.registered += 1
+
+    @property
+    def done(self):
+        return self.registered >= self.size
+
+    def report(self):
+        registered = [i for i in range(self.size) if self.config_at[i] and self.first_prop_at[i]]
+        latencies = [self.config_at[i] - self.first_prop_at[i] for i in registered]
+        resubmissions = [self.prop_count[i] - 1 for i in range(self.size) if self.prop_count[i]]
+
+        started = min((self.first_prop_at[i] for i in range(self.size) if self.prop_count[i]), default=None)
+        finished = max((self.config_at[i] for i in registered), default=None)
+        elapsed = (finished - started) if registered else None
+
+        return {
+            "devices": self.size,
+            "registered": len(registered),
+            "not_registered": self.size - len(registered),
+            "latency_s": {
+                "p50": percentile(latencies, 50),
+                "p90": percentile(latencies, 90),
+                "p99": percentile(latencies, 99),
+                "max": max(latencies, default=None),
+            },
+            "prop_resubmissions": {
+                "total": sum(resubmissions),
+                "p50": percentile(resubmissions, 50),
+                "p99": percentile(resubmissions, 99),
+                "max": max(resubmissions, default=None),
+            },
+            "elapsed_s": elapsed,
+            "registrations_per_s": round(len(registered) / elapsed, 2) if elapsed else None,
+        }
+
+    def per_device(self, device_id):
+        return [
+            {
+                "device_id": device_id(i),
+                "first_prop_at": self.first_prop_at[i] or None,
+                "prop_count": self.prop_count[i],
+                "config_at": self.config_at[i] or None,
+                "latency_s": (self.config_at[i] - self.first_prop_at[i]) if self.config_at[i] else None,
+            }
+            for i in range(self.size)
+        ]
+
+
+class RegistrationFleetSimulator(FleetSimulator):
+    """FleetSimulator ที่ส่งต่อ /prop และ /config ให้ RegistrationTracker"""
+
+    def __init__(self, fleet, tracker, **kwargs):
+        super().__init__(fleet, **kwargs)
+        self.tracker = tracker
+
+    def on_prop_published(self, index):
+        self.tracker.record_prop(index)
+
+    def on_config_received(self, index):
+        self.tracker.record_config(index)
+
+
+class TrackedVirtualDevice(VirtualDevice):
+    """VirtualDevice ที่ส่งต่อ /prop และ /config ให้ RegistrationTracker"""
+
+    def __init__(self, index, tracker, prop_interval=PROP_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+        self.tracker = tracker
+        self.prop_interval = prop_interval
+
+    def send_prop_once(self):
+        self.tracker.record_prop(self.index)
+        super().send_prop_once()
+
+    def handle_config_message(self, config):
+        self.tracker.record_config(self.index)
+        super().handle_config_message(config)
+
+
+def run_mqtt(args):
+    """อุปกรณ์ใหม่ N ตัวผ่าน broker จริง"""
+    fleet = FleetState(args.devices, device_prefix=args.device_prefix, faculty=args.faculty,
+                       connections=args.connections, prop_interval=args.prop_interval)
+    tracker = RegistrationTracker(args.devices, RealClock())
+    simulator = RegistrationFleetSimulator(fleet, tracker, broker_host=args.broker_host, broker_port=args.broker_port)
+
+    approver_client = approver = None
+    if args.auto_approve:
+        approver_client = mqtt.Client(client_id=f"registration_benchmark_approver_{os.getpid()}")
+        approver_client.username_pw_set(simulator.username, simulator.password)
+        approver = AutoApprover(approver_client, args.device_prefix, approve_delay=args.approve_delay,
+                                approvals_per_second=args.approve_rate, prop_topic=f"devices/{args.faculty}/+/prop")
+        approver_client.connect(simulator.broker_host, simulator.broker_port, 60)
+        approver_client.loop_start()
+
+    simulator.connect()
+    try:
+        # รอ SUBACK ของ /config (และ approver) ก่อนอุปกรณ์เปิดเครื่องพร้อมกัน ไม่เช่นนั้น /prop หรือ /config แรกจะหาย
+        subscriptions = [simulator.subscribed] + ([approver.subscribed] if approver else [])
+        deadline = time.time() + SUBSCRIBE_TIMEOUT
+        for subscribed in subscriptions:
+            if not subscribed.wait(max(0.0, deadline - time.time())):
+                raise TimeoutError(f"ไม่ได้รับ SUBACK ภายใน {SUBSCRIBE_TIMEOUT} วินาที")
+        simulator.run_for(time.time(), args.timeout, drain_timeout=5, spread=False,
+                          stop_when=lambda: tracker.done)
+    finally:
+        simulator.disconnect()
+        if approver_client:
+            approver.stop()
+            approver_client.loop_stop()
+            approver_client.disconnect()
+
+    return tracker, fleet.device_id
+
+
+def run_virtual(args):
+    """อุปกรณ์ใหม่ N ตัวในเวลาจำลอง (VirtualDevice + LocalBroker + AutoApprover)"""
+    clock = SimClock()
+    scheduler = EventScheduler(clock)
+    broker = LocalBroker(scheduler, args.delivery_latency)
+    tracker = RegistrationTracker(args.devices, clock)
+
+    def device_id(index):
+        return f"{args.device_prefix}_{index:06d}"
+
+    deadline = clock.now() + args.timeout
+    approver_client = LocalClient(broker)
+    AutoApprover(approver_client, args.device_prefix, clock=clock, call_later=scheduler.call_later,
+                 approve_delay=args.approve_delay, approvals_per_second=args.approve_rate)
+    approver_client.connect()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for index in range(args.devices):
+            device = TrackedVirtualDevice(index, tracker, prop_interval=args.prop_interval, device_id=device_id(index),
+                                          clock=clock, scheduler=scheduler, client=LocalClient(broker),
+                                          persist_files=False)
+            device.client.connect()
+
+        # รันทีละ prop interval จนลงทะเบียนครบหรือหมดเวลา (ไม่จำลอง data phase ต่อโดยไม่จำเป็น)
+        while not tracker.done and clock.now() < deadline:
+            scheduler.run_until(min(deadline, clock.now() + args.prop_interval))
+
+    return tracker, device_id
+
+
+def print_report(result, mode):
+    latency = result["latency_s"]
+    resubmissions = result["prop_resubmissions"]
+    print(f"📝 Registration Pipeline Benchmark ({mode})")
+    print(f"📱 Devices: {result['devices']} | ✅ Registered: {result['registered']} | ❌ Not registered: {result['not_registered']}")
+    if result["registered"]:
+        print(f"⏱️ Latency (/prop แรก -> /config): p50 {latency['p50']:.2f}s | p90 {latency['p90']:.2f}s | "
+              f"p99 {latency['p99']:.2f}s | max {latency['max']:.2f}s")
+        print(f"🔁 /prop resubmissions: total {resubmissions['total']} | p50 {resubmissions['p50']} | "
+              f"p99 {resubmissions['p99']} | max {resubmissions['max']}")
+        print(f"🚀 Throughput: {result['registrations_per_s']} registrations/s ในเวลา {result['elapsed_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registration pipeline benchmark")
+    parser.add_argument("--mode", choices=("mqtt", "virtual"), default="mqtt")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=600, help="วินาที (เวลาจริงหรือเวลาจำลอง) ก่อนหยุดรอ")
+    parser.add_argument("--device-prefix", default=f"ESP32_REG{int(time.time())}",
+                        help="ควรไม่ซ้ำกันในแต่ละรอบ เพื่อให้เป็นอุปกรณ์ใหม่จริงสำหรับ devices_pending")
+    parser.add_argument("--faculty", default=os.getenv("FACULTY", "engineering"))
+    parser.add_argument("--prop-interval", type=int, default=PROP_INTERVAL, help="วินาทีระหว่าง /prop ซ้ำ")
+    parser.add_argument("--connections", type=int, default=int(os.getenv("FLEET_CONNECTIONS", "4")))
+    parser.add_argument("--broker-host", default=None)
+    parser.add_argument("--broker-port", type=int, default=None)
+    parser.add_argument("--auto-approve", action="store_true", help="ใช้ AutoApprover แทน admin (mqtt mode)")
+    parser.add_argument("--approve-delay", type=float, default=0.0, help="วินาทีจาก /prop แรกจนอนุมัติ")
+    parser.add_argument("--approve-rate", type=float, default=None, help="การอนุมัติสูงสุดต่อวินาที")
+    parser.add_argument("--delivery-latency", type=float, default=0.0, help="latency ของ LocalBroker (virtual mode)")
+    parser.add_argument("--output", help="บันทึกสรุปและข้อมูลรายอุปกรณ์เป็นไฟล์ JSON")
+    args = parser.parse_args()
+
+    try:
+        tracker, device_id = run_mqtt(args) if args.mode == "mqtt" else run_virtual(args)
+    except TimeoutError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    result = tracker.report()
+    print_report(result, args.mode)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(dict(result, mode=args.mode, per_device=tracker.per_device(device_id)), f, indent=2, ensure_ascii=False)
+        print(f"💾 บันทึกผลลัพธ์: {args.output}")
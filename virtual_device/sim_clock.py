@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Simulated Clock - เวลาจำลองแบบ discrete-event สำหรับ VirtualDevice
+
+- SimClock / RealClock     : แหล่งเวลาของ timestamp ใน payload
+- EventScheduler           : กระโดดไปยัง event ถัดไปทันทีแทนการ sleep
+- LocalBroker / LocalClient : broker stand-in ในโปรเซส (API เท่าที่ VirtualDevice ใช้จาก paho Client)
+
+ลำดับ event ถูกกำหนดด้วย (เวลา, ลำดับที่ถูก schedule) จึงได้ผลเหมือนเดิมทุกครั้งที่รัน
+"""
+
+import heapq
+import itertools
+import time
+from datetime import datetime, timezone
+
+import paho.mqtt.client as mqtt
+
+
+class RealClock:
+    """เวลาจริง (ค่าเริ่มต้นของ VirtualDevice)"""
+
+    def now(self):
+        return time.time()
+
+    def isoformat(self):
+        return datetime.now(timezone.utc).isoformat()
+
+
+class SimClock:
+    """เวลาจำลอง เดินหน้าเฉพาะเมื่อ scheduler เลื่อนไปยัง event ถัดไป"""
+
+    def __init__(self, start=None):
+        self._now = time.time() if start is None else start
+
+    def now(self):
+        return self._now
+
+    def isoformat(self):
+        return datetime.fromtimestamp(self._now, timezone.utc).isoformat()
+
+    def advance_to(self, when):
+        if when < self._now:
+            raise ValueError(f"เวลาจำลองย้อนกลับไม่ได้: {when} < {self._now}")
+        self._now = when
+
+
+class EventScheduler:
+    def __init__(self, clock):
+        self.clock = clock
+        self.events_run = 0
+        self._queue = []
+        self._sequence = itertools.count()
+
+    def call_at(self, when, callback, *args):
+        """schedule callback(*args) ที่เวลาจำลอง when"""
+        heapq.heappush(self._queue, (when, next(self._sequence), callback, args))
+
+    def call_later(self, delay, callback, *args):
+        self.call_at(self.clock.now() + delay, callback, *args)
+
+    def run_until(self, end_time):
+        """รัน event ตามลำดับเวลาจนถึง end_time (หรือจนไม่มี event เหลือ)"""
+        while self._queue and self._queue[0][0] <= end_time:
+            when, _, callback, args = heapq.heappop(self._queue)
+            self.clock.advance_to(when)
+            callback(*args)
+            self.events_run += 1
+        if self.clock.now() < end_time:
+            self.clock.advance_to(end_time)
+
+    @property
+    def pending(self):
+        return len(self._queue)
+
+
+class _PublishResult:
+    """ค่าที่ publish() คืน (รองรับ .rc / .mid เหมือน MQTTMessageInfo)"""
+
+    def __init__(self, mid):
+        self.rc = mqtt.MQTT_ERR_SUCCESS
+        self.mid = mid
+
+
+class LocalBroker:
+    """broker stand-in: ส่งต่อข้อความให้ subscriber ผ่าน EventScheduler"""
+
+    def __init__(self, scheduler, delivery_latency=0.0):
+        self.scheduler = scheduler
+        self.delivery_latency = delivery_latency
+        self.subscriptions = []  # [(topic filter ที่มี wildcard, LocalClient)]
+        self.exact_subscriptions = {}  # topic -> [LocalClient] (เช่น /config ของแต่ละอุปกรณ์)
+        self.published = 0
+        self._mid = itertools.count(1)
+
+    def subscribe(self, client, topic_filter):
+        if '+' in topic_filter or '#' in topic_filter:
+            self.subscriptions.append((topic_filter, client))
+        else:
+            self.exact_subscriptions.setdefault(topic_filter, []).append(client)
+
+    def publish(self, topic, payload, qos=0):
+        self.published += 1
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        clients = [client for topic_filter, client in self.subscriptions if mqtt.topic_matches_sub(topic_filter, topic)]
+        clients.extend(self.exact_subscriptions.get(topic, ()))
+        for client in clients:
+            self.scheduler.call_later(self.delivery_latency, client.deliver, topic, payload, qos)
+        return _PublishResult(next(self._mid))
+
+
+class LocalClient:
+    """แทน paho Client ด้วย LocalBroker (connect / subscribe / publish / loop_*)"""
+
+    def __init__(self, broker, userdata=None):
+        self.broker = broker
+        self.userdata = userdata
+        self.on_connect = None
+        self.on_subscribe = None
+        self.on_message = None
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def connect(self, host=None, port=None, keepalive=60):
+        if self.on_connect:
+            self.broker.scheduler.call_later(0, self.on_connect, self, self.userdata, {}, 0)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, topic, qos=0):
+        self.broker.subscribe(self, topic)
+        if self.on_subscribe:
+            self.broker.scheduler.call_later(0, self.on_subscribe, self, self.userdata, 0, (qos,))
+        return mqtt.MQTT_ERR_SUCCESS, 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        return self.broker.publish(topic, payload, qos)
+
+    def deliver(self, topic, payload, qos):
+        if self.on_message:
+            message = mqtt.MQTTMessage(topic=topic.encode('utf-8'))
+            message.payload = payload
+            message.qos = qos
+            self.on_message(self, self.userdata, message)
@@ -10,6 +10,7 @@ Workflow:
 """
 
 import json
+import logging
 import time
 import random
 import threading
@@ -18,54 +19,7 @@ from datetime import datetime, timezone
 import paho.mqtt.client as mqtt
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
-class VirtualDevice:
-        """บันทึก config ลงไฟล์"""
-        try:
-            config_data = {
-                "saved_timestamp": datetime.now(timezone.utc).isoformat(),
-                "device_id": self.device_id,
-                "config": config
-            }
-            
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=2, ensure_ascii=False)
-            
-            print(f"✅ Config บันทึกแล้ว: {self.config_file}")
-            
-        except Exception as e:
-            print(f"❌ ไม่สามารถบันทึก config: {e}")
-
-    def load_config_from_file(self):
-        """โหลด config จากไฟล์ (ถ้ามี)"""
-        try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config_data = json.load(f)
-                
-                self.device_config = config_data.get('config')
-                if self.device_config:
-                    self.is_registered = True
-                    print(f"📂 โหลด config จากไฟล์: {self.config_file}")
-                    print(f"💾 บันทึกเมื่อ: {config_data.get('saved_timestamp')}")
-                    return True
-            
-            return False
-            
-        except Exception as e:
-            print(f"❌ ไม่สามารถโหลด config: {e}")
-            return False
-
-if __name__ == "__main__": json
-import time
-import random
-import threading
-import os
-from datetime import datetime, timezone
-import paho.mqtt.client as mqtt
-from dotenv import load_dotenv
+from fleet_logging import StructuredLogger, configure_logging, shutdown_logging
 
 # Load environment variables
 load_dotenv()
@@ -104,11 +58,49 @@ class VirtualDevice:
         # Load existing config if available
         self.load_config_from_file()
         
+        # Structured logging (sampled per-message events)
+        self.log = StructuredLogger(f"virtual_device.{self.device_id}")
+        
         # Threads
         self.prop_thread = None
         self.data_thread = None
         self.running = True
 
+    def save_config_to_file(self, config):
+        """บันทึก config ลงไฟล์"""
+        try:
+            config_data = {
+                "saved_timestamp": datetime.now(timezone.utc).isoformat(),
+                "device_id": self.device_id,
+                "config": config
+            }
+            
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(config_data, f, indent=2, ensure_ascii=False)
+            
+        except Exception as e:
+            self.log.event("config_save_error", level=logging.ERROR, file=self.config_file, error=str(e))
+
+    def load_config_from_file(self):
+        """โหลด config จากไฟล์ (ถ้ามี)"""
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config_data = json.load(f)
+                
+                self.device_config = config_data.get('config')
+                if self.device_config:
+                    self.is_registered = True
+                    print(f"📂 โหลด config จากไฟล์: {self.config_file}")
+                    print(f"💾 บันทึกเมื่อ: {config_data.get('saved_timestamp')}")
+                    return True
+            
+            return False
+            
+        except Exception as e:
+            print(f"❌ ไม่สามารถโหลด config: {e}")
+            return False
+
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             print(f"✅ เชื่อมต่อ MQTT สำเร็จ: {self.broker_host}:{self.broker_port}")
@@ -128,14 +120,14 @@ class VirtualDevice:
             topic = msg.topic
             payload = json.loads(msg.payload.decode())
             
-            print(f"📨 รับข้อมูล config จาก: {topic}")
-            print(f"📄 Config: {json.dumps(payload, indent=2, ensure_ascii=False)}")
+            self.log.event("config_received", topic=topic, keys=sorted(payload))
+            self.log.event("config_payload", level=logging.DEBUG, config=payload)
             
             if topic == self.config_topic:
                 self.handle_config_message(payload)
                 
         except Exception as e:
-            print(f"❌ Error processing message: {e}")
+            self.log.event("message_error", level=logging.ERROR, topic=msg.topic, error=str(e))
 
     def handle_config_message(self, config):
         """รับข้อมูลการลงทะเบียนจากเว็บ"""
@@ -145,11 +137,17 @@ class VirtualDevice:
         # Save config to file
         self.save_config_to_file(config)
         
-        print("\n🎉 อุปกรณ์ได้รับการอนุมัติแล้ว!")
-        print(f"📍 ตำแหน่ง: {config.get('assigned_location', {}).get('building', 'N/A')} ชั้น {config.get('assigned_location', {}).get('floor', 'N/A')}")
-        print(f"⚡ กำลังไฟ: {config.get('assigned_meter', {}).get('power_specifications', {}).get('rated_power', 0)/1000:.1f} kW")
-        print(f"🔧 มิเตอร์: {config.get('assigned_meter', {}).get('meter_model', 'N/A')}")
-        print(f"💾 Config ถูกบันทึกในไฟล์: {self.config_file}")
+        # อุปกรณ์ได้รับการอนุมัติแล้ว: หนึ่ง event ต่อ config
+        location = config.get('assigned_location', {})
+        meter = config.get('assigned_meter', {})
+        self.log.event(
+            "config_applied",
+            building=location.get('building', 'N/A'),
+            floor=location.get('floor', 'N/A'),
+            rated_power_kw=meter.get('power_specifications', {}).get('rated_power', 0) / 1000,
+            meter_model=meter.get('meter_model', 'N/A'),
+            config_file=self.config_file,
+        )
         
         # Stop prop phase, start data phase
         self.stop_prop_phase()
@@ -157,8 +155,7 @@ class VirtualDevice:
 
     def start_prop_phase(self):
         """Phase 1: ส่งข้อมูล device properties (ยังไม่ลงทะเบียน)"""
-        print("\n🔄 เริ่ม Phase 1: ส่ง Device Properties")
-        print(f"📡 Topic: {self.prop_topic}")
+        self.log.event("phase_started", phase="prop", topic=self.prop_topic, interval=30)
         
         def send_prop():
             while not self.is_registered and self.running:
@@ -170,7 +167,7 @@ class VirtualDevice:
                     qos=1
                 )
                 
-                print(f"📤 ส่ง /prop: {prop_data['device_id']} (รอการอนุมัติ...)")
+                self.log.sampled("prop_published", device_id=prop_data['device_id'], topic=self.prop_topic)
                 time.sleep(30)  # ส่งทุก 30 วินาที
         
         self.prop_thread = threading.Thread(target=send_prop)
@@ -179,13 +176,12 @@ class VirtualDevice:
 
     def stop_prop_phase(self):
         """หยุดการส่ง prop messages"""
-        print("🛑 หยุดการส่ง Device Properties")
+        self.log.event("phase_stopped", phase="prop")
         # prop_thread จะหยุดเองเมื่อ is_registered = True
 
     def start_data_phase(self):
         """Phase 2: ส่งข้อมูลการใช้ไฟฟ้าจริง (ลงทะเบียนแล้ว)"""
-        print("\n🔄 เริ่ม Phase 2: ส่ง Data จริง")
-        print(f"📡 Topic: {self.data_topic}")
+        self.log.event("phase_started", phase="data", topic=self.data_topic)
         
         def send_data():
             while self.is_registered and self.running:
@@ -203,7 +199,7 @@ class VirtualDevice:
                     data['electrical_measurements']['power']['active_power_l3']
                 ])
                 
-                print(f"📊 ส่ง /data: {power_total/1000:.1f}kW ({datetime.now().strftime('%H:%M:%S')})")
+                self.log.sampled("data_published", active_power=power_total)
                 time.sleep(self.data_interval)
         
         self.data_thread = threading.Thread(target=send_data)
@@ -313,6 +309,11 @@ class VirtualDevice:
             print(f"📱 Device ID: {self.device_id}")
             print(f"🌐 MQTT Broker: {self.broker_host}:{self.broker_port}")
             
+            configure_logging()
+            # อุปกรณ์เดี่ยว: log ทุกข้อความเป็นค่าเริ่มต้น (sampling มีไว้สำหรับ fleet)
+            self.log.sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+            self.log.start_summary(extra=lambda: {"device_id": self.device_id, "registered": self.is_registered})
+            
             self.client.connect(self.broker_host, self.broker_port, 60)
             self.client.loop_start()
             
@@ -333,6 +334,10 @@ class VirtualDevice:
             
         except Exception as e:
             print(f"❌ Error: {e}")
+        
+        finally:
+            self.log.stop_summary()
+            shutdown_logging()
 
 if __name__ == "__main__":
     device = VirtualDevice()
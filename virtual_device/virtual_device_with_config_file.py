@@ -12,6 +12,7 @@ Workflow:
 """
 
 import json
+import logging
 import time
 import random
 import threading
@@ -20,13 +21,135 @@ from datetime import datetime, timezone
 import paho.mqtt.client as mqtt
 from dotenv import load_dotenv
 
+from fleet_logging import StructuredLogger, configure_logging, shutdown_logging
+from sim_clock import RealClock
+
 # Load environment variables
 load_dotenv()
 
+PROP_INTERVAL = 30  # ส่ง /prop ทุก 30 วินาที
+
+def build_prop_payload(device_id, data_interval, timestamp=None):
+    """สร้าง payload /prop (ใช้ร่วมกันระหว่าง VirtualDevice และ fleet simulator)"""
+    if timestamp is None:
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+    return {
+        "device_id": device_id,
+        "device_name": "Computer Engineering Lab Meter", 
+        "data_collection_interval": data_interval,
+        "status": "online",
+        "timestamp": timestamp,
+        
+        # เฉพาะข้อมูลที่ device รู้จริง
+        "device_prop": {
+            "device_type": "digital_meter",
+            "installation_date": "2024-01-15",
+            "connection_type": "wifi",
+            "ip_address": "192.168.100.205",
+            "mac_address": "AA:BB:CC:DD:EE:FF",
+            "firmware_version": "2.1.3"
+        }
+    }
+
+
+def build_data_payload(device_id, data_interval, timestamp=None, sequence_number=None, total_energy=None):
+    """สร้าง payload /data ตามมาตรฐาน device_data_example.json แบบเป๊ะ
+
+    ถ้าไม่ระบุ sequence_number / total_energy จะสุ่มค่าเหมือนเดิม
+    """
+    if timestamp is None:
+        timestamp = datetime.now(timezone.utc).isoformat()
+    if sequence_number is None:
+        sequence_number = random.randint(1000, 9999)
+    if total_energy is None:
+        total_energy = round(random.uniform(800000, 900000), 3)
+    variation = random.uniform(0.9, 1.1)
+    
+    return {
+        "device_id": device_id,
+        "timestamp": timestamp,
+        "measurement_interval": data_interval,
+        "sequence_number": sequence_number,
+        
+        "network_status": "online",
+        "connection_quality": random.randint(75, 95),
+        "signal_strength": random.randint(-70, -45),
+        
+        "electrical_measurements": {
+            "voltage": round(random.uniform(375, 385) * variation, 1),
+            "current_amperage": round(random.uniform(40, 50) * variation, 1),
+            "power_factor": round(random.uniform(0.85, 0.95), 2),
+            "frequency": round(random.uniform(49.8, 50.2), 1),
+            
+            "active_power": round(random.uniform(25000, 30000) * variation, 1),
+            "reactive_power": round(random.uniform(10000, 15000) * variation, 1),
+            "apparent_power": round(random.uniform(28000, 33000) * variation, 1),
+            
+            "total_energy": total_energy,
+            "daily_energy": round(random.uniform(200, 300), 3)
+        },
+        
+        "three_phase_measurements": {
+            "is_three_phase": True,
+            "voltage_phase_b": round(random.uniform(375, 385) * variation, 1),
+            "voltage_phase_c": round(random.uniform(375, 385) * variation, 1),
+            "current_phase_b": round(random.uniform(40, 50) * variation, 1),
+            "current_phase_c": round(random.uniform(40, 50) * variation, 1),
+            "power_factor_phase_b": round(random.uniform(0.80, 0.90), 2),
+            "power_factor_phase_c": round(random.uniform(0.85, 0.95), 2),
+            "active_power_phase_a": round(random.uniform(8000, 10000) * variation, 1),
+            "active_power_phase_b": round(random.uniform(8000, 10000) * variation, 1),
+            "active_power_phase_c": round(random.uniform(8000, 10000) * variation, 1)
+        },
+        
+        "environmental_monitoring": {
+            "device_temperature": round(random.uniform(25, 40), 1)
+        },
+        
+        "device_health": {
+            "uptime_hours": random.randint(1, 720),  # 1-720 hours (30 days)
+            "last_maintenance": None,
+            "last_data_received": timestamp,
+            "data_collection_count": random.randint(1000, 10000),
+            "last_error_code": None,
+            "last_error_message": None,
+            "last_error_time": None,
+            "error_count_today": 0
+        },
+        
+        "meter_communication": {
+            "modbus_status": "ok",
+            "last_successful_read": timestamp,
+            "read_attempts": 1,
+            "read_errors": 0,
+            "response_time_ms": random.randint(200, 400),
+            "communication_errors": 0
+        },
+        
+        "energy_measurements": {
+            "total_energy_import": total_energy,
+            "total_energy_export": round(random.uniform(100, 200), 1),
+            "daily_energy_import": round(random.uniform(200, 300), 3),
+            "daily_energy_export": round(random.uniform(10, 20), 1),
+            "monthly_energy": round(random.uniform(6000, 8000), 3),
+            "peak_demand": round(random.uniform(30000, 40000) * variation, 1)
+        },
+        
+        "data_quality": {
+            "measurement_confidence": random.randint(95, 99),
+            "calibration_status": "valid",
+            "last_calibration": "2024-01-15T00:00:00.000Z",
+            "anomaly_detected": False,
+            "data_validation_passed": True
+        }
+    }
+
+
 class VirtualDevice:
-    def __init__(self):
+    def __init__(self, device_id=None, clock=None, scheduler=None, client=None, persist_files=True):
         # Device Configuration
-        self.device_id = os.getenv("DEVICE_ID", "ESP32_ENGR_LAB_001")
+        self.device_id = device_id or os.getenv("DEVICE_ID", "ESP32_ENGR_LAB_001")
         self.faculty = os.getenv("FACULTY", "engineering")
         
         # MQTT Configuration
@@ -44,31 +167,41 @@ class VirtualDevice:
         self.is_registered = False
         self.device_config = None
         self.data_interval = int(os.getenv("DATA_INTERVAL", "15"))  # seconds
+        self.prop_interval = PROP_INTERVAL  # seconds
         
         # Config file path
         self.config_file = f"{self.device_id}_config.json"
         self.prop_file = f"{self.device_id}_prop.json"
+        self.persist_files = persist_files
+        
+        # Clock / scheduler (scheduler = None -> ใช้ thread + sleep ตามเวลาจริง)
+        self.clock = clock or RealClock()
+        self.scheduler = scheduler
+        
+        # Structured logging (sampled per-message events)
+        self.log = StructuredLogger(f"virtual_device.{self.device_id}")
         
         # Threads
         self.running = True
         self.prop_thread = None
         self.data_thread = None
         
-        # MQTT Client
-        self.client = mqtt.Client()
+        # MQTT Client (หรือ LocalClient ในโหมดเวลาจำลอง)
+        self.client = client or mqtt.Client()
         self.client.username_pw_set(self.username, self.password)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         
         # Load existing files (prop first to check approval status)
-        self.load_prop_from_file()
-        self.load_config_from_file()
+        if self.persist_files:
+            self.load_prop_from_file()
+            self.load_config_from_file()
 
     def save_config_to_file(self, config):
         """บันทึก config ลงไฟล์"""
         try:
             config_data = {
-                "saved_timestamp": datetime.now(timezone.utc).isoformat(),
+                "saved_timestamp": self.clock.isoformat(),
                 "device_id": self.device_id,
                 "config": config
             }
@@ -76,10 +209,8 @@ class VirtualDevice:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config_data, f, indent=2, ensure_ascii=False)
             
-            print(f"✅ Config บันทึกแล้ว: {self.config_file}")
-            
         except Exception as e:
-            print(f"❌ ไม่สามารถบันทึก config: {e}")
+            self.log.event("config_save_error", level=logging.ERROR, file=self.config_file, error=str(e))
 
     def load_config_from_file(self):
         """โหลด config จากไฟล์ (ถ้ามี)"""
@@ -113,7 +244,7 @@ class VirtualDevice:
         """บันทึก prop data ลงไฟล์"""
         try:
             prop_file_data = {
-                "saved_timestamp": datetime.now(timezone.utc).isoformat(),
+                "saved_timestamp": self.clock.isoformat(),
                 "device_id": self.device_id,
                 "status": "pending",  # pending, approved, rejected
                 "prop_data": prop_data,
@@ -129,10 +260,8 @@ class VirtualDevice:
             with open(self.prop_file, 'w', encoding='utf-8') as f:
                 json.dump(prop_file_data, f, indent=2, ensure_ascii=False)
             
-            print(f"✅ Prop data บันทึกแล้ว: {self.prop_file}")
-            
         except Exception as e:
-            print(f"❌ ไม่สามารถบันทึก prop data: {e}")
+            self.log.event("prop_save_error", level=logging.ERROR, file=self.prop_file, error=str(e))
 
     def load_prop_from_file(self):
         """โหลด prop data จากไฟล์ (ถ้ามี)"""
@@ -168,15 +297,13 @@ class VirtualDevice:
                     prop_data = json.load(f)
                 
                 prop_data["status"] = status
-                prop_data["status_updated_at"] = datetime.now(timezone.utc).isoformat()
+                prop_data["status_updated_at"] = self.clock.isoformat()
                 
                 with open(self.prop_file, 'w', encoding='utf-8') as f:
                     json.dump(prop_data, f, indent=2, ensure_ascii=False)
                 
-                print(f"✅ อัปเดตสถานะ prop เป็น: {status}")
-                
         except Exception as e:
-            print(f"❌ ไม่สามารถอัปเดตสถานะ prop: {e}")
+            self.log.event("prop_status_error", level=logging.ERROR, status=status, error=str(e))
 
     def on_connect(self, client, userdata, flags, rc):
         """Callback เมื่อเชื่อมต่อ MQTT สำเร็จ"""
@@ -204,43 +331,42 @@ class VirtualDevice:
             if msg.topic == self.config_topic:
                 payload = json.loads(msg.payload.decode())
                 
-                print(f"\n📨 ได้รับ Config:")
-                print(f"📄 Config: {json.dumps(payload, indent=2, ensure_ascii=False)}")
+                self.log.event("config_received", topic=msg.topic, keys=sorted(payload))
+                self.log.event("config_payload", level=logging.DEBUG, config=payload)
                 
                 self.handle_config_message(payload)
                 
         except Exception as e:
-            print(f"❌ Error processing message: {e}")
+            self.log.event("message_error", level=logging.ERROR, topic=msg.topic, error=str(e))
 
     def handle_config_message(self, config):
         """รับข้อมูลการลงทะเบียนจากเว็บ"""
         self.device_config = config
         self.is_registered = True
         
-        # Save config to file
-        self.save_config_to_file(config)
-        
-        # Update prop status to approved
-        self.update_prop_status("approved")
-        
-        print("\n🎉 อุปกรณ์ได้รับการอนุมัติแล้ว!")
-        
-        # Extract info from config structure
-        location = config.get('assigned_location', {})
-        meter = config.get('assigned_meter', {})
-        power_specs = meter.get('power_specifications', {})
-        
-        print(f"📍 ตำแหน่ง: {location.get('building', 'N/A')} ชั้น {location.get('floor', 'N/A')}")
-        print(f"🏢 ห้อง: {location.get('room', 'N/A')}")
-        print(f"⚡ กำลังไฟ: {power_specs.get('rated_power', 0)/1000:.1f} kW")
-        print(f"🔧 มิเตอร์: {meter.get('meter_model', 'N/A')}")
-        print(f"💾 Config ถูกบันทึกในไฟล์: {self.config_file}")
+        # Save config to file / update prop status to approved
+        if self.persist_files:
+            self.save_config_to_file(config)
+            self.update_prop_status("approved")
         
         # Update data interval from config
         device_config = config.get('device_configuration', {})
         if device_config.get('data_collection_interval'):
             self.data_interval = device_config.get('data_collection_interval')
-            print(f"⏱️ อัปเดตช่วงเวลาส่งข้อมูล: {self.data_interval} วินาที")
+        
+        # อุปกรณ์ได้รับการอนุมัติแล้ว: หนึ่ง event ต่อ config
+        location = config.get('assigned_location', {})
+        meter = config.get('assigned_meter', {})
+        self.log.event(
+            "config_applied",
+            building=location.get('building', 'N/A'),
+            floor=location.get('floor', 'N/A'),
+            room=location.get('room', 'N/A'),
+            rated_power_kw=meter.get('power_specifications', {}).get('rated_power', 0) / 1000,
+            meter_model=meter.get('meter_model', 'N/A'),
+            data_interval=self.data_interval,
+            config_file=self.config_file if self.persist_files else None,
+        )
         
         # Stop prop phase, start data phase
         self.stop_prop_phase()
@@ -248,163 +374,96 @@ class VirtualDevice:
 
     def start_prop_phase(self):
         """Phase 1: ส่งข้อมูล device properties (ยังไม่ลงทะเบียน)"""
-        print("\n🔄 เริ่ม Phase 1: ส่ง Device Properties")
-        print(f"📡 Topic: {self.prop_topic}")
+        self.log.event("phase_started", phase="prop", topic=self.prop_topic, interval=self.prop_interval)
+        
+        if self.scheduler:
+            self.scheduler.call_later(0, self._scheduled_prop)
+            return
         
         def send_prop():
             while not self.is_registered and self.running:
-                prop_data = self.generate_prop_data()
-                
-                # บันทึก prop data ลงไฟล์
-                self.save_prop_to_file(prop_data)
-                
-                self.client.publish(
-                    self.prop_topic,
-                    json.dumps(prop_data, ensure_ascii=False),
-                    qos=1
-                )
-                
-                print(f"📤 ส่ง /prop: {prop_data['device_id']} (รอการอนุมัติ...)")
-                time.sleep(30)  # ส่งทุก 30 วินาที
+                self.send_prop_once()
+                time.sleep(self.prop_interval)
         
         self.prop_thread = threading.Thread(target=send_prop)
         self.prop_thread.daemon = True
         self.prop_thread.start()
 
+    def _scheduled_prop(self):
+        """prop phase ในโหมดเวลาจำลอง: ส่งหนึ่งครั้งแล้ว schedule ครั้งถัดไป"""
+        if not self.is_registered and self.running:
+            self.send_prop_once()
+            self.scheduler.call_later(self.prop_interval, self._scheduled_prop)
+
+    def send_prop_once(self):
+        """ส่ง /prop หนึ่งครั้ง"""
+        prop_data = self.generate_prop_data()
+        
+        # บันทึก prop data ลงไฟล์
+        if self.persist_files:
+            self.save_prop_to_file(prop_data)
+        
+        self.client.publish(
+            self.prop_topic,
+            json.dumps(prop_data, ensure_ascii=False),
+            qos=1
+        )
+        
+        self.log.sampled("prop_published", device_id=prop_data['device_id'], topic=self.prop_topic)
+
     def stop_prop_phase(self):
         """หยุด prop phase"""
-        print("⏹️ หยุด Prop Phase")
+        self.log.event("phase_stopped", phase="prop")
 
     def start_data_phase(self):
         """Phase 2: ส่งข้อมูลการใช้ไฟฟ้าจริง (ลงทะเบียนแล้ว)"""
-        print(f"\n🔄 เริ่ม Phase 2: ส่งข้อมูลไฟฟ้าจริง")
-        print(f"📡 Topic: {self.data_topic}")
-        print(f"⏱️ ทุก {self.data_interval} วินาที")
+        self.log.event("phase_started", phase="data", topic=self.data_topic, interval=self.data_interval)
+        
+        if self.scheduler:
+            self.scheduler.call_later(0, self._scheduled_data)
+            return
         
         def send_data():
             while self.is_registered and self.running:
-                data = self.generate_data()
-                
-                self.client.publish(
-                    self.data_topic,
-                    json.dumps(data, ensure_ascii=False),
-                    qos=1
-                )
-                
-                # แสดงข้อมูลสำคัญที่ส่ง
-                total_power = data['electrical_measurements']['active_power']
-                voltage = data['electrical_measurements']['voltage']
-                current = data['electrical_measurements']['current_amperage']
-                
-                print(f"📊 ส่ง /data: {total_power/1000:.1f}kW | {voltage:.1f}V | {current:.1f}A ({datetime.now().strftime('%H:%M:%S')})")
+                self.send_data_once()
                 time.sleep(self.data_interval)
         
         self.data_thread = threading.Thread(target=send_data)
         self.data_thread.daemon = True
         self.data_thread.start()
 
+    def _scheduled_data(self):
+        """data phase ในโหมดเวลาจำลอง: ส่งหนึ่งครั้งแล้ว schedule ครั้งถัดไป"""
+        if self.is_registered and self.running:
+            self.send_data_once()
+            self.scheduler.call_later(self.data_interval, self._scheduled_data)
+
+    def send_data_once(self):
+        """ส่ง /data หนึ่งครั้ง"""
+        data = self.generate_data()
+        
+        self.client.publish(
+            self.data_topic,
+            json.dumps(data, ensure_ascii=False),
+            qos=1
+        )
+        
+        # บันทึกข้อมูลสำคัญที่ส่ง (sampled)
+        measurements = data['electrical_measurements']
+        self.log.sampled(
+            "data_published",
+            active_power=measurements['active_power'],
+            voltage=measurements['voltage'],
+            current=measurements['current_amperage']
+        )
+
     def generate_prop_data(self):
         """สร้างข้อมูล Device Properties (เฉพาะข้อมูลที่ device รู้เอง)"""
-        return {
-            "device_id": self.device_id,
-            "device_name": "Computer Engineering Lab Meter", 
-            "data_collection_interval": self.data_interval,
-            "status": "online",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            
-            # เฉพาะข้อมูลที่ device รู้จริง
-            "device_prop": {
-                "device_type": "digital_meter",
-                "installation_date": "2024-01-15",
-                "connection_type": "wifi",
-                "ip_address": "192.168.100.205",
-                "mac_address": "AA:BB:CC:DD:EE:FF",
-                "firmware_version": "2.1.3"
-            }
-        }
+        return build_prop_payload(self.device_id, self.data_interval, self.clock.isoformat())
 
     def generate_data(self):
         """สร้างข้อมูลการใช้ไฟฟ้าตามมาตรฐาน device_data_example.json แบบเป๊ะ"""
-        variation = random.uniform(0.9, 1.1)
-        
-        return {
-            "device_id": self.device_id,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "measurement_interval": self.data_interval,
-            "sequence_number": random.randint(1000, 9999),
-            
-            "network_status": "online",
-            "connection_quality": random.randint(75, 95),
-            "signal_strength": random.randint(-70, -45),
-            
-            "electrical_measurements": {
-                "voltage": round(random.uniform(375, 385) * variation, 1),
-                "current_amperage": round(random.uniform(40, 50) * variation, 1),
-                "power_factor": round(random.uniform(0.85, 0.95), 2),
-                "frequency": round(random.uniform(49.8, 50.2), 1),
-                
-                "active_power": round(random.uniform(25000, 30000) * variation, 1),
-                "reactive_power": round(random.uniform(10000, 15000) * variation, 1),
-                "apparent_power": round(random.uniform(28000, 33000) * variation, 1),
-                
-                "total_energy": round(random.uniform(800000, 900000), 3),
-                "daily_energy": round(random.uniform(200, 300), 3)
-            },
-            
-            "three_phase_measurements": {
-                "is_three_phase": True,
-                "voltage_phase_b": round(random.uniform(375, 385) * variation, 1),
-                "voltage_phase_c": round(random.uniform(375, 385) * variation, 1),
-                "current_phase_b": round(random.uniform(40, 50) * variation, 1),
-                "current_phase_c": round(random.uniform(40, 50) * variation, 1),
-                "power_factor_phase_b": round(random.uniform(0.80, 0.90), 2),
-                "power_factor_phase_c": round(random.uniform(0.85, 0.95), 2),
-                "active_power_phase_a": round(random.uniform(8000, 10000) * variation, 1),
-                "active_power_phase_b": round(random.uniform(8000, 10000) * variation, 1),
-                "active_power_phase_c": round(random.uniform(8000, 10000) * variation, 1)
-            },
-            
-            "environmental_monitoring": {
-                "device_temperature": round(random.uniform(25, 40), 1)
-            },
-            
-            "device_health": {
-                "uptime_hours": random.randint(1, 720),  # 1-720 hours (30 days)
-                "last_maintenance": None,
-                "last_data_received": datetime.now(timezone.utc).isoformat(),
-                "data_collection_count": random.randint(1000, 10000),
-                "last_error_code": None,
-                "last_error_message": None,
-                "last_error_time": None,
-                "error_count_today": 0
-            },
-            
-            "meter_communication": {
-                "modbus_status": "ok",
-                "last_successful_read": datetime.now(timezone.utc).isoformat(),
-                "read_attempts": 1,
-                "read_errors": 0,
-                "response_time_ms": random.randint(200, 400),
-                "communication_errors": 0
-            },
-            
-            "energy_measurements": {
-                "total_energy_import": round(random.uniform(800000, 900000), 3),
-                "total_energy_export": round(random.uniform(100, 200), 1),
-                "daily_energy_import": round(random.uniform(200, 300), 3),
-                "daily_energy_export": round(random.uniform(10, 20), 1),
-                "monthly_energy": round(random.uniform(6000, 8000), 3),
-                "peak_demand": round(random.uniform(30000, 40000) * variation, 1)
-            },
-            
-            "data_quality": {
-                "measurement_confidence": random.randint(95, 99),
-                "calibration_status": "valid",
-                "last_calibration": "2024-01-15T00:00:00.000Z",
-                "anomaly_detected": False,
-                "data_validation_passed": True
-            }
-        }
+        return build_data_payload(self.device_id, self.data_interval, self.clock.isoformat())
 
     def run(self):
         """รันอุปกรณ์จำลอง"""
@@ -415,6 +474,11 @@ class VirtualDevice:
             print(f"💾 Config File: {self.config_file}")
             print(f"📋 Prop File: {self.prop_file}")
             
+            configure_logging()
+            # อุปกรณ์เดี่ยว: log ทุกข้อความเป็นค่าเริ่มต้น (sampling มีไว้สำหรับ fleet)
+            self.log.sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+            self.log.start_summary(extra=lambda: {"device_id": self.device_id, "registered": self.is_registered})
+            
             self.client.connect(self.broker_host, self.broker_port, 60)
             self.client.loop_start()
             
@@ -438,6 +502,10 @@ class VirtualDevice:
             
         except Exception as e:
             print(f"❌ Error: {e}")
+        
+        finally:
+            self.log.stop_summary()
+            shutdown_logging()
 
 if __name__ == "__main__":
     device = VirtualDevice()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Virtual-Time Simulation
+รัน lifecycle ของ VirtualDevice (prop -> approval -> data) หลายชั่วโมงภายในไม่กี่วินาที
+
+- ใช้ SimClock + EventScheduler แทนการ sleep (กระโดดไปยัง event ถัดไปทันที)
+- timestamp ใน generate_prop_data() / generate_data() มาจากเวลาจำลอง
+- LocalBroker แทน MQTT broker จริง และ SimReceiver แทนฝั่งเว็บ (รับ /prop, /data และส่ง /config)
+- ความเร็วถูกจำกัดโดยฝั่งรับเท่านั้น เพราะไม่มีการรอเวลาจริงเลย
+
+Usage:
+    python virtual_time_sim.py --devices 20 --hours 24 --approve-after 600
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+from auto_approver import build_config_message
+from fleet_logging import configure_logging, shutdown_logging
+from sim_clock import SimClock, EventScheduler, LocalBroker, LocalClient
+from virtual_device_with_config_file import PROP_INTERVAL, VirtualDevice
+
+
+class SimReceiver:
+    """ฝั่งเว็บจำลอง: ตรวจลำดับ event / timestamp และอนุมัติอุปกรณ์หลัง approve_after วินาที"""
+
+    def __init__(self, broker, clock, approve_after=None):
+        self.broker = broker
+        self.clock = clock
+        self.approve_after = approve_after
+        self.counts = {"prop": 0, "data": 0}
+        self.order_violations = 0
+        self.last_timestamp = {}  # device_id -> timestamp ล่าสุดที่ได้รับ
+        self.approval_scheduled = set()
+
+        self.client = LocalClient(broker)
+        self.client.on_message = self.on_message
+        self.client.subscribe("devices/+/+/prop")
+        self.client.subscribe("devices/+/+/data")
+
+    def on_message(self, client, userdata, msg):
+        _, faculty, device_id, kind = msg.topic.split('/')
+        payload = json.loads(msg.payload.decode())
+        self.counts[kind] += 1
+
+        # payload ต้องไม่มาจากอนาคต (เผื่อ 1 µs จากการปัดเศษของ isoformat)
+        # และต้องไม่ย้อนเวลาเทียบกับข้อความก่อนหน้าของอุปกรณ์เดียวกัน
+        sent_at = datetime.fromisoformat(payload["timestamp"]).timestamp()
+        if sent_at > self.clock.now() + 1e-6 or sent_at < self.last_timestamp.get(device_id, sent_at):
+            self.order_violations += 1
+        self.last_timestamp[device_id] = sent_at
+
+        if kind == "prop" and self.approve_after is not None and device_id not in self.approval_scheduled:
+            self.approval_scheduled.add(device_id)
+            self.broker.scheduler.call_later(self.approve_after, self.approve, faculty, device_id)
+
+    def approve(self, faculty, device_id):
+        """ส่ง /config ในรูปแบบเดียวกับ sendConfigToApprovedDevice() ใน mqtt-service.ts"""
+        config_message = build_config_message(device_id, faculty, self.clock.isoformat())
+        self.client.publish(f"devices/{faculty}/{device_id}/config", json.dumps(config_message), qos=1)
+
+
+def run_simulation(devices, hours, approve_after=600, start=None, delivery_latency=0.0,
+                   device_prefix="ESP32_VSIM", seed=0, verbose=False):
+    random.seed(seed)
+    clock = SimClock(start)
+    scheduler = EventScheduler(clock)
+    broker = LocalBroker(scheduler, delivery_latency)
+    receiver = SimReceiver(broker, clock, approve_after)
+
+    if verbose:
+        # event ต่อข้อความของ VirtualDevice ไปทาง StructuredLogger ไม่ใช่ stdout
+        configure_logging()
+
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, \
+            (contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)):
+        fleet = []
+        for index in range(devices):
+            device = VirtualDevice(
+                device_id=f"{device_prefix}_{index:06d}",
+                clock=clock,
+                scheduler=scheduler,
+                client=LocalClient(broker),
+                persist_files=False,
+            )
+            fleet.append(device)
+            # อุปกรณ์เปิดเครื่องกระจายกันในช่วง prop interval แรก
+            scheduler.call_later(random.uniform(0, PROP_INTERVAL), device.client.connect)
+
+        try:
+            scheduler.run_until(clock.now() + hours * 3600)
+        finally:
+            if verbose:
+                shutdown_logging()
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "devices": devices,
+        "virtual_hours": hours,
+        "wall_seconds": round(wall_seconds, 3),
+        "speedup": round(hours * 3600 / wall_seconds, 1),
+        "events": scheduler.events_run,
+        "messages": broker.published,
+        "messages_per_wall_second": round(broker.published / wall_seconds, 1),
+        "received": receiver.counts,
+        "registered": sum(1 for device in fleet if device.is_registered),
+        "order_violations": receiver.order_violations,
+        "end_time": clock.isoformat(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Virtual-time VirtualDevice simulation")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--approve-after", type=float, default=600,
+                        help="วินาที (เวลาจำลอง) หลัง /prop แรกจนส่ง /config; ค่าติดลบ = ไม่อนุมัติ")
+    parser.add_argument("--start", help="เวลาเริ่มจำลอง (ISO 8601, ไม่ระบุ timezone = UTC) default: ตอนนี้")
+    parser.add_argument("--delivery-latency", type=float, default=0.0, help="latency ของ broker (วินาทีจำลอง)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true",
+                        help="แสดง output และ log ของ VirtualDevice (LOG_SAMPLE_RATE=1 เพื่อดูทุกข้อความ)")
+    args = parser.parse_args()
+
+    start = None
+    if args.start:
+        start = datetime.fromisoformat(args.start)
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+
+    result = run_simulation(
+        args.devices,
+        args.hours,
+        approve_after=args.approve_after if args.approve_after >= 0 else None,
+        start=start.timestamp() if start else None,
+        delivery_latency=args.delivery_latency,
+        seed=args.seed,
+        verbose=args.verbose,
+    )
+
+    print("⏩ Virtual-Time Simulation")
+    print(f"📱 Devices: {result['devices']} | ⏱️ {result['virtual_hours']} ชม. จำลองใน {result['wall_seconds']} วินาที "
+          f"(×{result['speedup']})")
+    print(f"📨 Messages: {result['messages']} ({result['messages_per_wall_second']} msg/s wall) | Events: {result['events']}")
+    print(f"📥 Received: /prop {result['received']['prop']} | /data {result['received']['data']}")
+    print(f"✅ Registered: {result['registered']}/{result['devices']}")
+    print(f"🔍 Order violations: {result['order_violations']}")
+    print(f"🕒 End time: {result['end_time']}")